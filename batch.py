@@ -0,0 +1,213 @@
+import os
+from array import array
+from itertools import islice
+
+from trace_io import BINARY_MAGIC, OP_LOAD, OP_STORE, RECORD, is_binary_trace, read_trace
+
+# NumPy is optional: without it every trace goes through the scalar simulator path
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+BATCH_SIZE = 1 << 20
+
+if numpy is not None:
+    # NumPy view of one binary trace record (see trace_io.RECORD)
+    RECORD_DTYPE = numpy.dtype([('operation', '<u1'), ('address', '<u8'), ('data', '<u8')])
+
+
+def batch_supported(simulator):
+    # The batched path replays accesses grouped by set, so it cannot produce the
+    # in-order per-access event stream
+    return numpy is not None and simulator.events is None
+
+
+def decode_addresses(addresses, block_size, num_sets):
+    # Split a whole array of addresses into set indices and tags at once. Power-of-two
+    # geometries (every valid configuration) use shifts and masks.
+    if block_size & (block_size - 1) == 0 and num_sets & (num_sets - 1) == 0:
+        blocks = addresses >> (block_size.bit_length() - 1)
+        return blocks & (num_sets - 1), blocks >> (num_sets.bit_length() - 1)
+    blocks = addresses // block_size
+    return blocks % num_sets, blocks // num_sets
+
+
+def simulate_batch(simulator, operations, addresses, data):
+    # Simulate a chunk of accesses held in NumPy arrays. Sets are independent, so the
+    # accesses are regrouped by set (keeping their order within each set) and each set's
+    # state machine runs over the pre-decoded indices and tags. When a set sees the same
+    # block several times in a row, every access after the first is a guaranteed hit;
+    # for policies where such hits do not change the replacement state they are counted
+    # in bulk instead of being replayed.
+    count = len(addresses)
+    if count == 0:
+        return
+    indices, tags = decode_addresses(addresses, simulator.block_size, simulator.num_sets)
+    order = numpy.argsort(indices, kind='stable')
+    indices = indices[order]
+    tags = tags[order]
+    operations = operations[order]
+    data = data[order]
+    addresses = addresses[order]
+
+    leader = numpy.ones(count, dtype=bool)
+    if simulator.policy.repeat_hit_stable:
+        leader[1:] = (indices[1:] != indices[:-1]) | (tags[1:] != tags[:-1])
+    leaders = numpy.flatnonzero(leader)
+    run_ids = numpy.cumsum(leader) - 1
+    repeats = ~leader
+    is_store = operations == OP_STORE
+    repeat_loads = numpy.bincount(run_ids[repeats & ~is_store], minlength=len(leaders))
+    repeat_stores = numpy.bincount(run_ids[repeats & is_store], minlength=len(leaders))
+    # The last repeated store of a run decides the data left in its line
+    store_positions = numpy.flatnonzero(repeats & is_store)
+    store_runs = run_ids[store_positions]
+    last_in_run = numpy.ones(len(store_positions), dtype=bool)
+    last_in_run[:-1] = store_runs[1:] != store_runs[:-1]
+    last_store_data = numpy.zeros(len(leaders), dtype=numpy.uint64)
+    last_store_data[store_runs[last_in_run]] = data[store_positions[last_in_run]]
+
+    # Per-set state machine over the run leaders. This mirrors load_operation and
+    # store_operation (including the store-miss retry that counts as a hit and a second
+    # data write), minus the event hooks and the address decoding.
+    lookup = simulator.lookup
+    cache_data = simulator.data
+    dirty = simulator.dirty
+    touch = simulator.policy_touch
+    handle_cache_miss = simulator.handle_cache_miss
+    num_sets = simulator.num_sets
+    hits = 0
+    misses = 0
+    store_misses = 0
+    for operation, address, value, index, tag, stores, last_data in zip(
+            operations[leaders].tolist(), addresses[leaders].tolist(), data[leaders].tolist(),
+            indices[leaders].tolist(), tags[leaders].tolist(), repeat_stores.tolist(),
+            last_store_data.tolist()):
+        key = tag * num_sets + index
+        slot = lookup.get(key)
+        if slot is None:
+            misses += 1
+            handle_cache_miss(index, tag, address)
+            if operation != OP_LOAD:
+                slot = lookup[key]
+                hits += 1
+                store_misses += 1
+                cache_data[slot] = value
+                dirty[slot] = True
+                if touch is not None:
+                    touch(index, slot)
+        else:
+            hits += 1
+            if touch is not None:
+                touch(index, slot)
+            if operation != OP_LOAD:
+                cache_data[slot] = value
+                dirty[slot] = True
+        if stores:
+            slot = lookup[key]
+            cache_data[slot] = last_data
+            dirty[slot] = True
+
+    total_stores = int(is_store.sum())
+    stats = simulator.stats
+    stats['cache_hits'] += hits + int(repeat_loads.sum()) + int(repeat_stores.sum())
+    stats['cache_misses'] += misses
+    stats['data_reads'] += count - total_stores
+    stats['data_writes'] += total_stores + store_misses
+
+
+def iter_record_batches(records, batch_size=BATCH_SIZE):
+    # Group a stream of (operation, address, data) records into NumPy array batches
+    records = iter(records)
+    while True:
+        operations = bytearray()
+        addresses = array('Q')
+        data = array('Q')
+        for operation, address, value in islice(records, batch_size):
+            operations.append(operation)
+            addresses.append(address)
+            data.append(value)
+        if not addresses:
+            return
+        yield (numpy.frombuffer(operations, dtype=numpy.uint8), numpy.frombuffer(addresses, dtype=numpy.uint64),
+               numpy.frombuffer(data, dtype=numpy.uint64))
+
+
+def check_operations(operations):
+    # NumPy counterpart of the operation check in trace_io.iter_binary_records
+    if len(operations) and operations.max() > OP_STORE:
+        raise ValueError(f"Invalid operation {int(operations.max())} in binary trace record")
+
+
+def map_binary_trace(trace_file_path):
+    # Memory-map the records of a binary trace as a structured array (None if it is empty)
+    count = (os.path.getsize(trace_file_path) - len(BINARY_MAGIC)) // RECORD.size
+    if count <= 0:
+        return None
+    return numpy.memmap(trace_file_path, dtype=RECORD_DTYPE, mode='r', offset=len(BINARY_MAGIC), shape=(count,))
+
+
+def iter_binary_batches(trace_file_path, batch_size=BATCH_SIZE, hasher=None):
+    # Decode a binary trace straight from a memory map, one batch of records at a time,
+    # optionally hashing the raw file bytes along the way
+    trace = map_binary_trace(trace_file_path)
+    if hasher is not None:
+        hasher.update(BINARY_MAGIC)
+    if trace is not None:
+        for start in range(0, len(trace), batch_size):
+            chunk = trace[start:start + batch_size]
+            check_operations(chunk['operation'])
+            if hasher is not None:
+                hasher.update(chunk)
+            yield chunk['operation'], chunk['address'], chunk['data']
+    if hasher is not None:
+        # Trailing bytes of an incomplete record
+        with open(trace_file_path, 'rb') as trace_file:
+            trace_file.seek(len(BINARY_MAGIC) + (len(trace) if trace is not None else 0) * RECORD.size)
+            hasher.update(trace_file.read())
+
+
+def iter_trace_batches(trace_file_path, batch_size=BATCH_SIZE, hasher=None):
+    if trace_file_path != '-' and is_binary_trace(trace_file_path):
+        yield from iter_binary_batches(trace_file_path, batch_size, hasher)
+    else:
+        yield from iter_record_batches(read_trace(trace_file_path, hasher=hasher), batch_size)
+
+
+def process_batches(simulator, batches):
+    # Batched equivalent of CacheSimulator.process_records
+    for operations, addresses, data in batches:
+        simulate_batch(simulator, operations, addresses, data)
+    simulator.write_back_dirty_blocks()
+
+
+def simulate_records(simulator, records):
+    # Simulate a piece of a trace without the end-of-trace write-back, batched when possible
+    if not batch_supported(simulator):
+        simulator.process_records(records, write_back=False)
+        return
+    for operations, addresses, data in iter_record_batches(records):
+        simulate_batch(simulator, operations, addresses, data)
+
+
+def process_trace_arrays(simulator, operations, addresses, data):
+    # Simulate a whole trace held in bytearray/array('Q') buffers, batched when possible
+    if not batch_supported(simulator):
+        simulator.process_records(zip(operations, addresses, data))
+        return
+    process_batches(simulator, [(numpy.frombuffer(operations, dtype=numpy.uint8),
+                                 numpy.frombuffer(addresses, dtype=numpy.uint64),
+                                 numpy.frombuffer(data, dtype=numpy.uint64))])
+
+
+def read_memory_trace(simulator, trace_file_path, hasher=None):
+    # Batched equivalent of CacheSimulator.read_memory_trace, falling back to the scalar
+    # path when NumPy is missing or per-access events are wanted
+    if not batch_supported(simulator):
+        simulator.read_memory_trace(trace_file_path, hasher)
+        return
+    try:
+        process_batches(simulator, iter_trace_batches(trace_file_path, hasher=hasher))
+    except FileNotFoundError:
+        print(f"Error: The file '{trace_file_path}' was not found.")
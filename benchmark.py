@@ -0,0 +1,275 @@
+import json
+import multiprocessing
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from array import array
+from itertools import product
+
+import batch
+from cache import CacheSimulator
+from cli_parser import parse_option_values, split_args
+from trace_io import OP_LOAD, OP_STORE, write_binary_trace
+from workloads import DEFAULT_FOOTPRINT, WORKLOADS, generate_workload
+
+# Peak RSS comes from getrusage, which is not available on every platform
+try:
+    import resource
+except ImportError:
+    resource = None
+
+DEFAULT_SUITE_SIZES = (10000, 100000)
+# Results slower than the baseline by more than this fraction count as regressions
+REGRESSION_TOLERANCE = 0.10
+
+
+class CounterScanCache:
+    # Reference LRU implementation using the previous approach: a linear tag scan per
+    # access and a global use counter, with the victim found by a min() scan of the set
+    def __init__(self, capacity, block_size, associativity):
+        self.block_size = block_size
+        self.associativity = associativity
+        self.num_sets = (capacity * 1024) // (block_size * associativity)
+        num_lines = self.num_sets * associativity
+        self.valid = bytearray(num_lines)
+        self.tags = array('Q', bytes(8 * num_lines))
+        self.lru_counters = array('Q', bytes(8 * num_lines))
+        self.lru_counter = 0
+        self.misses = 0
+
+    def access(self, address):
+        index = (address // self.block_size) % self.num_sets
+        tag = address // (self.block_size * self.num_sets)
+        base = index * self.associativity
+        end = base + self.associativity
+        self.lru_counter += 1
+        for slot in range(base, end):
+            if self.valid[slot] and self.tags[slot] == tag:
+                self.lru_counters[slot] = self.lru_counter
+                return
+        self.misses += 1
+        slot = self.valid.find(0, base, end)
+        if slot == -1:
+            slot = min(range(base, end), key=self.lru_counters.__getitem__)
+        self.valid[slot] = True
+        self.tags[slot] = tag
+        self.lru_counters[slot] = self.lru_counter
+
+    def process_records(self, records):
+        access = self.access
+        for _, address, _ in records:
+            access(address)
+
+
+def random_records(count, footprint, seed=1):
+    # Uniformly random loads and stores over a footprint (in bytes)
+    generator = random.Random(seed)
+    return [(OP_STORE if generator.random() < 0.3 else OP_LOAD, generator.randrange(footprint), 0)
+            for _ in range(count)]
+
+
+def time_run(cache, records):
+    start = time.perf_counter()
+    cache.process_records(records)
+    return time.perf_counter() - start
+
+
+def benchmark_lru(accesses=200000, capacity=64, block_size=64, associativities=(2, 4, 8, 16, 32, 64)):
+    # Compare LRU lookup and replacement cost of CacheSimulator against the counter-scan
+    # reference as associativity grows; the footprint is twice the capacity so that
+    # both hits and replacements are exercised
+    records = random_records(accesses, 2 * capacity * 1024)
+    results = []
+    for associativity in associativities:
+        simulator_seconds = time_run(CacheSimulator(capacity, block_size, associativity), records)
+        reference_seconds = time_run(CounterScanCache(capacity, block_size, associativity), records)
+        results.append({
+            'associativity': associativity,
+            'accesses': accesses,
+            'simulator_accesses_per_sec': accesses / simulator_seconds,
+            'counter_scan_accesses_per_sec': accesses / reference_seconds,
+            'speedup': reference_seconds / simulator_seconds,
+        })
+    return results
+
+
+def print_lru_results(results):
+    print(f"{'Ways':>6} {'Simulator acc/s':>16} {'Counter scan acc/s':>19} {'Speedup':>8}")
+    for row in results:
+        print(f"{row['associativity']:>6} {row['simulator_accesses_per_sec']:>16.0f} "
+              f"{row['counter_scan_accesses_per_sec']:>19.0f} {row['speedup']:>7.2f}x")
+
+
+def valid_configurations(capacities=None, block_sizes=None, associativities=None):
+    # Every valid (capacity, block size, associativity), optionally restricted to subsets
+    return list(product(capacities or CacheSimulator.VALID_CAPACITIES,
+                        block_sizes or CacheSimulator.VALID_BLOCK_SIZES,
+                        associativities or CacheSimulator.VALID_ASSOCIATIVITIES))
+
+
+def peak_rss_kb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, Linux kilobytes
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+def measure_configuration(connection, trace_path, config, launched):
+    # Runs in a freshly spawned interpreter. Startup covers interpreter start, imports
+    # and cache construction, measured from the moment the parent launched the process.
+    simulator = CacheSimulator(*config)
+    ready = time.time()
+    start = time.perf_counter()
+    batch.read_memory_trace(simulator, trace_path)
+    seconds = time.perf_counter() - start
+    connection.send({'startup_seconds': ready - launched, 'run_seconds': seconds, 'peak_rss_kb': peak_rss_kb(),
+                     'cache_misses': simulator.stats['cache_misses']})
+    connection.close()
+
+
+def run_in_fresh_process(trace_path, config):
+    context = multiprocessing.get_context('spawn')
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(target=measure_configuration, args=(sender, trace_path, config, time.time()))
+    process.start()
+    sender.close()
+    try:
+        measurement = receiver.recv()
+    except EOFError:
+        measurement = None
+    process.join()
+    if measurement is None:
+        raise RuntimeError(f"Benchmark process for {config} exited with code {process.exitcode}")
+    return measurement
+
+
+def benchmark_suite(workloads=tuple(WORKLOADS), sizes=DEFAULT_SUITE_SIZES, configs=None,
+                    footprint=DEFAULT_FOOTPRINT, seed=1, progress=None):
+    # Simulate every workload and size on every configuration, each run in its own process
+    # so that peak RSS and startup time are not polluted by earlier runs. Traces are
+    # generated once per workload and size into temporary binary files.
+    configs = configs or valid_configurations()
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for workload, size in product(workloads, sizes):
+            trace_path = os.path.join(directory, f"{workload}_{size}.bin")
+            write_binary_trace(generate_workload(workload, size, footprint, seed), trace_path)
+            for config in configs:
+                measurement = run_in_fresh_process(trace_path, config)
+                row = {
+                    'workload': workload,
+                    'accesses': size,
+                    'capacity': config[0],
+                    'block_size': config[1],
+                    'associativity': config[2],
+                    'accesses_per_sec': size / measurement['run_seconds'] if measurement['run_seconds'] else None,
+                    'startup_seconds': measurement['startup_seconds'],
+                    'peak_rss_kb': measurement['peak_rss_kb'],
+                    'miss_rate': measurement['cache_misses'] / size,
+                }
+                results.append(row)
+                if progress is not None:
+                    progress(row)
+    return results
+
+
+def suite_metadata(footprint, seed):
+    # Environment details stored with the results, so runs are only compared like for like
+    return {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'numpy': batch.numpy.__version__ if batch.numpy is not None else None,
+        'footprint': footprint,
+        'seed': seed,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+
+
+def result_key(row):
+    return row['workload'], row['accesses'], row['capacity'], row['block_size'], row['associativity']
+
+
+def find_regressions(baseline, results, tolerance=REGRESSION_TOLERANCE):
+    # Rows whose throughput fell by more than the tolerance relative to a baseline run
+    previous = {result_key(row): row for row in baseline}
+    regressions = []
+    for row in results:
+        old = previous.get(result_key(row))
+        if old is None or not old['accesses_per_sec'] or not row['accesses_per_sec']:
+            continue
+        ratio = row['accesses_per_sec'] / old['accesses_per_sec']
+        if ratio < 1 - tolerance:
+            regressions.append((row, ratio))
+    return regressions
+
+
+def print_suite_row(row):
+    rss = f"{row['peak_rss_kb']} KB" if row['peak_rss_kb'] is not None else "n/a"
+    print(f"{row['workload']:>14} {row['accesses']:>10} {row['capacity']:>3}KB/{row['block_size']}B/{row['associativity']}-way "
+          f"{row['accesses_per_sec']:>12.0f} acc/s  startup {row['startup_seconds']:.3f}s  peak RSS {rss}  "
+          f"miss rate {row['miss_rate']:.4f}")
+
+
+def parse_list(value, convert=int):
+    return tuple(convert(item) for item in value.split(',')) if value else None
+
+
+def print_usage():
+    print("Usage: python benchmark.py [-n<accesses>] [-o<results.json>]")
+    print("       python benchmark.py -w<workloads|all> [-z<sizes>] [-c<capacities>] [-b<block sizes>]")
+    print("                           [-a<associativities>] [-f<footprint>] [-s<seed>] [-o<results.json>] [-d<baseline.json>]")
+    print(f"  workloads: comma separated list of {', '.join(WORKLOADS)} (or all)")
+    print("  -z, -c, -b, -a: comma separated lists; by default every valid configuration at 10000 and 100000 accesses")
+    print("  -d: compare with an earlier results file and fail on throughput regressions")
+
+
+def run_suite(params):
+    workloads = tuple(WORKLOADS) if params['w'] == 'all' else parse_list(params['w'], str)
+    for workload in workloads:
+        if workload not in WORKLOADS:
+            raise ValueError(f"Unknown workload: {workload}")
+    configs = valid_configurations(parse_list(params.get('c')), parse_list(params.get('b')),
+                                   parse_list(params.get('a')))
+    for config in configs:
+        CacheSimulator.validate_params(*config)
+    footprint = params.get('f', DEFAULT_FOOTPRINT)
+    seed = params.get('s', 1)
+    results = benchmark_suite(workloads, parse_list(params.get('z')) or DEFAULT_SUITE_SIZES, configs, footprint,
+                              seed, progress=print_suite_row)
+    if 'o' in params:
+        with open(params['o'], 'w') as output_file:
+            json.dump({'metadata': suite_metadata(footprint, seed), 'results': results}, output_file, indent=2)
+    if 'd' in params:
+        with open(params['d']) as baseline_file:
+            baseline = json.load(baseline_file)['results']
+        regressions = find_regressions(baseline, results)
+        for row, ratio in regressions:
+            print(f"Regression: {row['workload']} {row['accesses']} {row['capacity']}KB/{row['block_size']}B/"
+                  f"{row['associativity']}-way at {ratio:.0%} of baseline throughput")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    try:
+        options, positional = split_args(sys.argv[1:])
+        params = parse_option_values(options, string_params=('o', 'w', 'z', 'c', 'b', 'a', 'd'))
+        if set(params) - {'n', 'o', 'w', 'z', 'c', 'b', 'a', 'f', 's', 'd'} or positional:
+            print_usage()
+            raise ValueError("Invalid arguments")
+        if 'w' in params:
+            run_suite(params)
+        else:
+            results = benchmark_lru(accesses=params.get('n', 200000))
+            print_lru_results(results)
+            if 'o' in params:
+                with open(params['o'], 'w') as output_file:
+                    json.dump(results, output_file, indent=2)
+    except (OSError, RuntimeError, ValueError) as e:
+        print(f"Error: {e}")
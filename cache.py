@@ -1,11 +1,29 @@
+from array import array
+
+from memory import MainMemory, MappedMainMemory
+from replacement import POLICIES, create_policy
+from trace_io import OP_LOAD, parse_trace_lines, read_trace
+
+
 class CacheSimulator:
-    def __init__(self, capacity, block_size, associativity):
+    # Supported cache geometries
+    VALID_CAPACITIES = (2, 4, 8, 16, 32, 64)
+    VALID_BLOCK_SIZES = (2, 4, 8, 16, 32, 64, 128)
+    VALID_ASSOCIATIVITIES = (2, 4, 8)
+
+    def __init__(self, capacity, block_size, associativity, memory_size_mb=16, memory_file=None, events=None,
+                 policy='lru', seed=0):
         self.capacity = capacity
         self.block_size = block_size
         self.associativity = associativity
         self.num_sets = (capacity * 1024) // (block_size * associativity)
-        self.cache = self.initialize_cache()
-        self.main_memory = self.initialize_main_memory()
+        self.num_lines = self.num_sets * associativity
+        self.policy_name = policy
+        self.seed = seed
+        self.initialize_cache()
+        self.main_memory = self.initialize_main_memory(memory_size_mb, memory_file)
+        # Optional event sink (see events.py); None keeps per-access event generation off the hot path
+        self.events = events
         # Initialize statistics
         self.stats = {
             'cache_hits': 0,
@@ -16,75 +34,73 @@ class CacheSimulator:
         }
 
     def initialize_cache(self):
-        # Initialize cache as a list of sets, where each set contains a list of cache lines
-        cache = []
-        for _ in range(self.num_sets):
-            set_lines = [{'valid': False, 'tag': None, 'data': [0] * self.block_size, 'dirty': False, 'lru_counter': 0} for _ in range(self.associativity)]
-            cache.append(set_lines)
-        return cache
-
-    def initialize_main_memory(self):
-        # Initialize main memory with 16 MB, where each word is set to its address value
-        memory_size = 16 * 1024 * 1024 // 4  # 16 MB with 4-byte words
-        main_memory = [i for i in range(memory_size)]
-        return main_memory
-
-    def read_memory_trace(self, trace_file_path):
-        # Read memory trace from a file
+        # Cache state lives in flat arrays with one entry per line. The line for
+        # (set, way) is stored at slot set * associativity + way, so all the ways
+        # of a set are contiguous.
+        self.valid = bytearray(self.num_lines)
+        self.dirty = bytearray(self.num_lines)
+        self.tags = array('Q', bytes(8 * self.num_lines))
+        self.data = array('Q', bytes(8 * self.num_lines))
+        # Valid lines indexed by block number (address // block_size) for O(1) lookup
+        self.lookup = {}
+        # Replacement state lives in the policy (see replacement.py). Policies whose state
+        # is not changed by hits have touch = None, which lets hits skip the call.
+        self.policy = create_policy(self.policy_name, self.num_sets, self.associativity, self.seed)
+        self.policy_touch = self.policy.touch
+
+    def initialize_main_memory(self, size_mb=16, memory_file=None):
+        # Initialize main memory (16 MB by default), where each word is set to its address value.
+        # Words are produced on demand, so nothing is allocated until memory is written.
+        if memory_file is not None:
+            return MappedMainMemory(memory_file, size_mb)
+        return MainMemory(size_mb)
+
+    def read_memory_trace(self, trace_file_path, hasher=None):
+        # Stream the memory trace from a file ("-" for stdin). Text traces may be gzip/xz
+        # compressed; binary traces written by trace_io.py skip text parsing entirely.
         try:
-            with open(trace_file_path, 'r') as trace_file:
-                traces = trace_file.readlines()
-                self.process_traces(traces)
+            self.process_records(read_trace(trace_file_path, hasher=hasher))
         except FileNotFoundError:
             print(f"Error: The file '{trace_file_path}' was not found.")
 
     def process_traces(self, traces):
-        # Process each line in the memory trace
-        for trace in traces:
-            trace = trace.strip()
-            if not trace:
-                continue
-
-            # Expected trace format: "LOAD 0x0001" or "STORE 0x0001 0xAB"
-            parts = trace.split()
-            if len(parts) < 2:
-                print(f"Invalid trace format: {trace}")
-                continue
-
-            operation = parts[0].upper()
-            address = int(parts[1], 16)
-
-            if operation == "LOAD":
-                self.load_operation(address)
-            elif operation == "STORE":
-                if len(parts) != 3:
-                    print(f"Invalid STORE trace format: {trace}")
-                    continue
-                data = int(parts[2], 16)
-                self.store_operation(address, data)
+        # Process each line in the memory trace; traces may be any iterable of lines
+        self.process_records(parse_trace_lines(traces))
+
+    def process_records(self, records, write_back=True):
+        # Process parsed (operation, address, data) records one at a time. Callers that feed
+        # the trace in pieces pass write_back=False for all but the last piece.
+        load_operation = self.load_operation
+        store_operation = self.store_operation
+        for operation, address, data in records:
+            if operation == OP_LOAD:
+                load_operation(address)
             else:
-                print(f"Unknown operation type: {operation}")
+                store_operation(address, data)
 
         # After processing all traces, write back dirty blocks
-        self.write_back_dirty_blocks()
+        if write_back:
+            self.write_back_dirty_blocks()
 
     def load_operation(self, address):
         # Extract set index and tag from address
         index, tag = self.extract_index_and_tag(address)
 
         # Check if the tag is present in the cache set
-        cache_set = self.cache[index]
-        for line in cache_set:
-            if line['valid'] and line['tag'] == tag:
-                # Cache hit
-                print(f"Cache HIT for LOAD at address: {hex(address)}")
-                line['lru_counter'] = self.get_new_lru_counter()
-                self.stats['cache_hits'] += 1
-                self.stats['data_reads'] += 1
-                return line['data']
+        slot = self.lookup.get(tag * self.num_sets + index)
+        if slot is not None:
+            # Cache hit
+            if self.events is not None:
+                self.events.emit('hit', 'LOAD', address, index, tag)
+            if self.policy_touch is not None:
+                self.policy_touch(index, slot)
+            self.stats['cache_hits'] += 1
+            self.stats['data_reads'] += 1
+            return self.data[slot]
 
         # Cache miss
-        print(f"Cache MISS for LOAD at address: {hex(address)}")
+        if self.events is not None:
+            self.events.emit('miss', 'LOAD', address, index, tag)
         self.stats['cache_misses'] += 1
         self.stats['data_reads'] += 1
         # Handle cache miss: read from memory and load into cache
@@ -95,20 +111,22 @@ class CacheSimulator:
         index, tag = self.extract_index_and_tag(address)
 
         # Check if the tag is present in the cache set
-        cache_set = self.cache[index]
-        for line in cache_set:
-            if line['valid'] and line['tag'] == tag:
-                # Cache hit
-                print(f"Cache HIT for STORE at address: {hex(address)}")
-                line['data'] = [data]  # Assuming the block size is 1 for simplicity
-                line['dirty'] = True
-                line['lru_counter'] = self.get_new_lru_counter()
-                self.stats['cache_hits'] += 1
-                self.stats['data_writes'] += 1
-                return
+        slot = self.lookup.get(tag * self.num_sets + index)
+        if slot is not None:
+            # Cache hit
+            if self.events is not None:
+                self.events.emit('hit', 'STORE', address, index, tag)
+            self.data[slot] = data  # Assuming the block size is 1 for simplicity
+            self.dirty[slot] = True
+            if self.policy_touch is not None:
+                self.policy_touch(index, slot)
+            self.stats['cache_hits'] += 1
+            self.stats['data_writes'] += 1
+            return
 
         # Cache miss
-        print(f"Cache MISS for STORE at address: {hex(address)}")
+        if self.events is not None:
+            self.events.emit('miss', 'STORE', address, index, tag)
         self.stats['cache_misses'] += 1
         self.stats['data_writes'] += 1
         # Handle cache miss: load the cache line from memory and update it
@@ -116,29 +134,33 @@ class CacheSimulator:
         self.store_operation(address, data)  # Retry store after bringing into cache
 
     def handle_cache_miss(self, index, tag, address):
-        # Find an empty line or use LRU policy
-        cache_set = self.cache[index]
-        empty_line = next((line for line in cache_set if not line['valid']), None)
+        # Find an empty line or ask the replacement policy for a victim
+        base = index * self.associativity
+        slot = self.valid.find(0, base, base + self.associativity)
 
-        if empty_line is not None:
+        if slot != -1:
             # Use the empty line
-            empty_line['valid'] = True
-            empty_line['tag'] = tag
-            empty_line['data'] = [address]  # Load data from memory (dummy example)
-            empty_line['lru_counter'] = self.get_new_lru_counter()
-            print(f"Loaded memory address {hex(address)} into cache set {index}")
+            self.valid[slot] = True
+            self.tags[slot] = tag
+            self.data[slot] = address  # Load data from memory (dummy example)
+            if self.events is not None:
+                self.events.emit('fill', None, address, index, tag)
         else:
-            # Apply LRU replacement
-            evicted_line = min(cache_set, key=lambda line: line['lru_counter'])
-            if evicted_line['dirty']:
+            # Apply the replacement policy
+            slot = self.policy.victim(index)
+            evicted_tag = self.tags[slot]
+            del self.lookup[evicted_tag * self.num_sets + index]
+            if self.dirty[slot]:
                 # Write back to memory if the line is dirty
-                print(f"Writing back dirty block with tag {evicted_line['tag']} from set {index}")
+                if self.events is not None:
+                    self.events.emit('evict', None, self.block_address(index, evicted_tag), index, evicted_tag)
                 self.stats['dirty_writebacks'] += 1
-            evicted_line['valid'] = True
-            evicted_line['tag'] = tag
-            evicted_line['data'] = [address]  # Load data from memory (dummy example)
-            evicted_line['lru_counter'] = self.get_new_lru_counter()
-            print(f"Replaced line in cache set {index} with memory address {hex(address)}")
+            self.tags[slot] = tag
+            self.data[slot] = address  # Load data from memory (dummy example)
+            if self.events is not None:
+                self.events.emit('replace', None, address, index, tag)
+        self.lookup[tag * self.num_sets + index] = slot
+        self.policy.insert(index, slot)
 
     def extract_index_and_tag(self, address):
         # Dummy implementation for extracting index and tag
@@ -146,22 +168,68 @@ class CacheSimulator:
         tag = address // (self.block_size * self.num_sets)
         return index, tag
 
-    def get_new_lru_counter(self):
-        # Returns an incremented LRU counter value to keep track of usage
-        if not hasattr(self, 'lru_counter'):
-            self.lru_counter = 0
-        self.lru_counter += 1
-        return self.lru_counter
+    def block_address(self, index, tag):
+        # Rebuild the address of the first byte of a cached block from its set index and tag
+        return (tag * self.num_sets + index) * self.block_size
+
+    def rebuild_lookup(self):
+        # Recreate the block lookup from the cache arrays after they were replaced wholesale
+        self.lookup = {self.tags[slot] * self.num_sets + slot // self.associativity: slot
+                       for slot in range(self.num_lines) if self.valid[slot]}
+
+    def find_line(self, index, tag):
+        # Return the slot holding the block, or None if it is not cached
+        return self.lookup.get(tag * self.num_sets + index)
+
+    def fill_line(self, index, tag, dirty=False):
+        # Install a block without touching the statistics, as cache hierarchies do.
+        # Returns (block_address, dirty) of the line evicted to make room, or None.
+        base = index * self.associativity
+        slot = self.valid.find(0, base, base + self.associativity)
+        evicted = None
+        if slot == -1:
+            slot = self.policy.victim(index)
+            evicted_tag = self.tags[slot]
+            del self.lookup[evicted_tag * self.num_sets + index]
+            evicted = (self.block_address(index, evicted_tag), bool(self.dirty[slot]))
+        else:
+            self.valid[slot] = True
+        self.tags[slot] = tag
+        self.data[slot] = self.block_address(index, tag)
+        self.dirty[slot] = dirty
+        self.lookup[tag * self.num_sets + index] = slot
+        self.policy.insert(index, slot)
+        return evicted
+
+    def invalidate_line(self, index, slot):
+        # Drop a line from the cache; returns whether it was dirty
+        self.valid[slot] = False
+        del self.lookup[self.tags[slot] * self.num_sets + index]
+        self.policy.remove(index, slot)
+        dirty = bool(self.dirty[slot])
+        self.dirty[slot] = False
+        return dirty
 
     def write_back_dirty_blocks(self):
         # Write back all dirty blocks from the cache to the main memory
-        print("\nWriting back dirty blocks to main memory...")
-        for index, cache_set in enumerate(self.cache):
-            for line in cache_set:
-                if line['valid'] and line['dirty']:
-                    # Write back dirty data to memory
-                    self.stats['dirty_writebacks'] += 1
-                    print(f"Writing back dirty block with tag {line['tag']} from set {index}")
+        if self.events is not None:
+            self.events.emit('flush', None, None, None, None)
+        valid = self.valid
+        dirty = self.dirty
+        for slot in range(self.num_lines):
+            if valid[slot] and dirty[slot]:
+                # Write back dirty data to memory
+                self.stats['dirty_writebacks'] += 1
+                if self.events is not None:
+                    index = slot // self.associativity
+                    self.events.emit('writeback', None, self.block_address(index, self.tags[slot]), index, self.tags[slot])
+
+    def iter_cache_lines(self):
+        # Yield (set, way, tag, dirty, data) for every valid line, in set and way order
+        ways = self.associativity
+        for slot in range(self.num_lines):
+            if self.valid[slot]:
+                yield slot // ways, slot % ways, self.tags[slot], bool(self.dirty[slot]), self.data[slot]
 
     def print_statistics(self):
         # Print collected statistics
@@ -172,22 +240,28 @@ class CacheSimulator:
             "\nCache simulation complete. All dirty blocks have been written back to main memory, and the simulation has ended successfully.")
 
     @staticmethod
-    def validate_params(capacity, block_size, associativity):
+    def validate_params(capacity, block_size, associativity, policy='lru'):
         if not CacheSimulator.is_valid_capacity(capacity):
             raise ValueError(f"Invalid capacity value: {capacity}")
         if not CacheSimulator.is_valid_block_size(block_size):
             raise ValueError(f"Invalid block size value: {block_size}")
         if not CacheSimulator.is_valid_associativity(associativity):
             raise ValueError(f"Invalid associativity value: {associativity}")
+        if not CacheSimulator.is_valid_policy(policy):
+            raise ValueError(f"Invalid replacement policy: {policy}")
 
     @staticmethod
     def is_valid_capacity(capacity):
-        return capacity in [2,4, 8, 16, 32, 64]
+        return capacity in CacheSimulator.VALID_CAPACITIES
 
     @staticmethod
     def is_valid_block_size(block_size):
-        return block_size in [2,4, 8, 16, 32, 64, 128]
+        return block_size in CacheSimulator.VALID_BLOCK_SIZES
 
     @staticmethod
     def is_valid_associativity(associativity):
-        return associativity in [ 2, 4, 8]
+        return associativity in CacheSimulator.VALID_ASSOCIATIVITIES
+
+    @staticmethod
+    def is_valid_policy(policy):
+        return policy in POLICIES
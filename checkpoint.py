@@ -0,0 +1,178 @@
+import json
+import os
+import signal
+import struct
+import threading
+from array import array
+from itertools import islice
+
+import batch
+from cache import CacheSimulator
+from memory import PAGE_SHIFT, PAGE_WORDS, MappedMainMemory
+
+# Checkpoint file layout: an 8-byte magic, a little-endian uint32 header length, a JSON
+# header (configuration, trace position, statistics and the list of arrays that follow)
+# and then the raw contents of every array in header order.
+CHECKPOINT_MAGIC = b'CSCHKPT1'
+HEADER_LENGTH = struct.Struct('<I')
+CHECKPOINT_VERSION = 2
+
+DEFAULT_INTERVAL = 1000000
+# Records between checks for a checkpoint requested by signal
+SIGNAL_POLL_INTERVAL = 65536
+
+CACHE_FIELDS = ('valid', 'dirty', 'tags', 'data')
+
+
+def state_arrays(simulator):
+    # (name, array) pairs covering the cache lines and the replacement policy state
+    arrays = [(field, getattr(simulator, field)) for field in CACHE_FIELDS]
+    policy = simulator.policy
+    arrays.extend((f"policy.{field}", getattr(policy, field)) for field in policy.set_fields + policy.line_fields)
+    return arrays
+
+
+def trace_identity(trace_file_path):
+    # Size and modification time of a trace file, used to make sure a resumed run
+    # continues the same file (None for stdin or a file that cannot be found)
+    if trace_file_path is None or trace_file_path == '-':
+        return None
+    try:
+        stat = os.stat(trace_file_path)
+    except OSError:
+        return None
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def memory_pages(simulator):
+    # (page number, page words) for every page of main memory that has been written
+    memory = simulator.main_memory
+    if isinstance(memory, MappedMainMemory):
+        return [(page, memory.words[page << PAGE_SHIFT:(page + 1) << PAGE_SHIFT])
+                for page, initialized in enumerate(memory.initialized) if initialized]
+    return sorted(memory.pages.items())
+
+
+def save_checkpoint(simulator, checkpoint_path, trace_file_path=None, trace_offset=0):
+    # Snapshot the full simulator state. The file is written next to its destination
+    # and renamed into place, so an interrupted save never corrupts an older checkpoint.
+    arrays = state_arrays(simulator)
+    pages = memory_pages(simulator)
+    header = {
+        'version': CHECKPOINT_VERSION,
+        'config': {'capacity': simulator.capacity, 'block_size': simulator.block_size,
+                   'associativity': simulator.associativity, 'policy': simulator.policy_name,
+                   'seed': simulator.seed, 'memory_size_mb': len(simulator.main_memory) * 4 // (1024 * 1024)},
+        'trace': trace_file_path,
+        'trace_offset': trace_offset,
+        'trace_identity': trace_identity(trace_file_path),
+        'stats': simulator.stats,
+        'arrays': [[name, len(values)] for name, values in arrays],
+        'memory_pages': [page for page, _ in pages],
+    }
+    encoded = json.dumps(header).encode()
+    temporary_path = checkpoint_path + '.tmp'
+    with open(temporary_path, 'wb') as checkpoint_file:
+        checkpoint_file.write(CHECKPOINT_MAGIC)
+        checkpoint_file.write(HEADER_LENGTH.pack(len(encoded)))
+        checkpoint_file.write(encoded)
+        for _, values in arrays:
+            checkpoint_file.write(values)
+        for _, words in pages:
+            checkpoint_file.write(words)
+    os.replace(temporary_path, checkpoint_path)
+
+
+def read_exactly(checkpoint_file, size):
+    data = checkpoint_file.read(size)
+    if len(data) != size:
+        raise ValueError("Truncated checkpoint file")
+    return data
+
+
+def load_checkpoint(checkpoint_path, events=None, trace_file_path=None):
+    # Restore a simulator from a checkpoint. Returns (simulator, trace path, trace offset):
+    # the checkpointed trace (unless another trace_file_path is given) continues where it
+    # stopped, any other trace starts from the beginning on the restored cache.
+    with open(checkpoint_path, 'rb') as checkpoint_file:
+        if checkpoint_file.read(len(CHECKPOINT_MAGIC)) != CHECKPOINT_MAGIC:
+            raise ValueError(f"Not a simulator checkpoint: {checkpoint_path}")
+        header_length, = HEADER_LENGTH.unpack(read_exactly(checkpoint_file, HEADER_LENGTH.size))
+        header = json.loads(read_exactly(checkpoint_file, header_length))
+        if header['version'] != CHECKPOINT_VERSION:
+            raise ValueError(f"Unsupported checkpoint version: {header['version']}")
+
+        config = header['config']
+        simulator = CacheSimulator(config['capacity'], config['block_size'], config['associativity'],
+                                   memory_size_mb=config['memory_size_mb'], events=events,
+                                   policy=config['policy'], seed=config['seed'])
+        arrays = state_arrays(simulator)
+        if len(arrays) != len(header['arrays']):
+            raise ValueError("Checkpoint does not match the simulator state layout")
+        for (name, values), (saved_name, length) in zip(arrays, header['arrays']):
+            if name != saved_name or len(values) != length:
+                raise ValueError(f"Checkpoint does not match the simulator state layout: {saved_name}")
+            restored = read_exactly(checkpoint_file, length * memoryview(values).itemsize)
+            if isinstance(values, bytearray):
+                values[:] = restored
+            else:
+                values[:] = array(values.typecode, restored)
+        for page in header['memory_pages']:
+            words = array('I', read_exactly(checkpoint_file, PAGE_WORDS * 4))
+            simulator.main_memory.pages[page] = words
+
+    simulator.stats.update(header['stats'])
+    simulator.rebuild_lookup()
+    trace_file_path = trace_file_path or header['trace']
+    if trace_file_path != header['trace']:
+        return simulator, trace_file_path, 0
+    if trace_identity(trace_file_path) != header['trace_identity']:
+        raise ValueError(f"Trace {trace_file_path} has changed since checkpoint {checkpoint_path} was saved")
+    return simulator, trace_file_path, header['trace_offset']
+
+
+class CheckpointRequest:
+    # Flag raised by SIGUSR1 (where available) asking for a checkpoint at the next poll
+    def __init__(self):
+        self.requested = False
+        self.previous_handler = None
+
+    def install(self):
+        if hasattr(signal, 'SIGUSR1') and threading.current_thread() is threading.main_thread():
+            self.previous_handler = signal.signal(signal.SIGUSR1, self.request)
+
+    def uninstall(self):
+        if self.previous_handler is not None:
+            signal.signal(signal.SIGUSR1, self.previous_handler)
+            self.previous_handler = None
+
+    def request(self, signum=None, frame=None):
+        self.requested = True
+
+
+def run_with_checkpoints(simulator, records, checkpoint_path, interval=DEFAULT_INTERVAL, trace_file_path=None,
+                         trace_offset=0):
+    # Simulate a record stream, saving a checkpoint every `interval` records and whenever
+    # SIGUSR1 is received (no checkpoints are saved when checkpoint_path is None).
+    # Returns the trace offset reached.
+    request = CheckpointRequest()
+    request.install()
+    try:
+        records = iter(records)
+        since_checkpoint = 0
+        while True:
+            chunk = list(islice(records, min(interval - since_checkpoint, SIGNAL_POLL_INTERVAL)))
+            if not chunk:
+                break
+            batch.simulate_records(simulator, chunk)
+            trace_offset += len(chunk)
+            since_checkpoint += len(chunk)
+            if checkpoint_path is not None and (since_checkpoint >= interval or request.requested):
+                save_checkpoint(simulator, checkpoint_path, trace_file_path, trace_offset)
+                request.requested = False
+            if since_checkpoint >= interval:
+                since_checkpoint = 0
+    finally:
+        request.uninstall()
+    simulator.write_back_dirty_blocks()
+    return trace_offset
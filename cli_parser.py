@@ -1,29 +1,107 @@
 import sys
 
-def parse_params(args):
-    if len(args) != 3:
-        print_usage()
-        raise ValueError("Incorrect number of arguments")
+from events import SUMMARY
+
+REQUIRED_PARAMS = ('c', 'b', 'a')
+
+# Optional "-X<value>" parameters and their defaults
+OPTIONAL_PARAMS = {
+    'v': SUMMARY,  # Verbosity: 0 quiet, 1 summary, 2 per-access events
+    'e': None,     # Event stream file (.csv or .jsonl)
+    'r': 'lru',    # Replacement policy
+    's': 0,        # Seed for the random replacement policy
+    'j': 1,        # Worker processes; more than one shards the trace by cache set
+    'k': None,     # Checkpoint file written while simulating
+    'i': 1000000,  # Accesses between checkpoints
+    'l': None,     # Checkpoint file to resume from
+    'm': 'exact',  # Simulation mode: exact, or sampled by sets or time windows
+    'f': 10,       # Sampling factor
+    'w': 10000,    # Measured accesses per time-sampling window
+    'u': 10000,    # Warm-up accesses before each time-sampling window
+    'p': None,     # Instrumentation report (JSON)
+    'd': None,     # Results cache directory ("off" disables it)
+}
+STRING_PARAMS = ('e', 'r', 'k', 'l', 'm', 'p', 'd')
 
+
+def split_args(args):
+    # Separate "-X<value>" options from positional arguments such as the trace file ("-" is stdin)
+    options = [arg for arg in args if len(arg) > 1 and arg.startswith('-')]
+    positional = [arg for arg in args if not (len(arg) > 1 and arg.startswith('-'))]
+    return options, positional
+
+
+def parse_option_values(options, string_params=STRING_PARAMS):
     params = {}
-    for arg in args:
+    for arg in options:
         if len(arg) < 2:
             raise ValueError(f"Invalid argument format: {arg}")
         option = arg[1]
         value_str = arg[2:]
+        if option in string_params:
+            if not value_str:
+                raise ValueError(f"Missing value for argument {option}")
+            params[option] = value_str
+            continue
         try:
             value = int(value_str)
         except ValueError:
             raise ValueError(f"Invalid value for argument {option}: {value_str}")
         params[option] = value
+    return params
+
+
+def parse_params(args):
+    options, _ = split_args(args)
+    required = [arg for arg in options if arg[1] in REQUIRED_PARAMS]
+    if len(required) != 3:
+        print_usage()
+        raise ValueError("Incorrect number of arguments")
+
+    params = parse_option_values(required)
 
     if 'c' not in params or 'b' not in params or 'a' not in params:
         raise ValueError("Missing required parameters")
 
     return params['c'], params['b'], params['a']
 
+
+def parse_options(args):
+    # Parse the optional parameters and the trace file path, filling in defaults
+    options, positional = split_args(args)
+    optional = [arg for arg in options if arg[1] not in REQUIRED_PARAMS]
+    for arg in optional:
+        if arg[1] not in OPTIONAL_PARAMS:
+            print_usage()
+            raise ValueError(f"Unknown argument: {arg}")
+    if len(positional) > 1:
+        print_usage()
+        raise ValueError("Only one memory trace file may be given")
+
+    params = dict(OPTIONAL_PARAMS)
+    params.update(parse_option_values(optional))
+    params['trace'] = positional[0] if positional else None
+    return params
+
+
 def print_usage():
-    print("Usage: python main.py -c<capacity> -b<blocksize> -a<associativity>")
+    print("Usage: python main.py -c<capacity> -b<blocksize> -a<associativity> [options] [trace_file]")
     print("  <capacity> in KB: 4, 8, 16, 32, or 64")
     print("  <blocksize> in bytes: 4, 8, 16, 32, 64, 128, 256, or 512")
     print("  <associativity>: 1, 2, 4, 8, 16")
+    print("Options:")
+    print("  -v<level>: 0 quiet, 1 print statistics (default), 2 print every cache event")
+    print("  -e<file>: write every cache event to a .csv or .jsonl file")
+    print("  -r<policy>: replacement policy: lru (default), fifo, random, plru, srrip or brrip")
+    print("  -s<seed>: seed for the random replacement policy (default: 0)")
+    print("  -j<workers>: simulate with several processes, each owning a subset of the cache sets (default: 1)")
+    print("  -k<file>: save a checkpoint of the simulator state to <file> while simulating (also on SIGUSR1)")
+    print("  -i<accesses>: accesses between checkpoints (default: 1000000)")
+    print("  -l<file>: resume from a checkpoint; with a different trace file, continue from the warmed-up cache")
+    print("  -m<mode>: exact (default), sets (simulate 1 in <factor> sets) or time (1 in <factor> windows)")
+    print("  -f<factor>: sampling factor for the sampled modes (default: 10)")
+    print("  -w<accesses> / -u<accesses>: measured and warm-up accesses per time-sampling window (default: 10000 each)")
+    print("  -p<file>: write per-set histograms, a compulsory/capacity/conflict miss breakdown, reuse distances")
+    print("            and phase timings to a JSON report")
+    print("  -d<directory>: results cache for repeated runs (default: ~/.cache/cache-simulator, 'off' to disable)")
+    print("  trace_file: memory trace to simulate, '-' for stdin (default: memory_trace1.txt)")
@@ -0,0 +1,106 @@
+import csv
+import json
+
+# Verbosity levels
+QUIET = 0    # Simulate only; nothing is printed
+SUMMARY = 1  # Print the statistics once the trace has been simulated
+VERBOSE = 2  # Also print one message per cache event
+
+# Columns of the per-access event stream
+EVENT_FIELDS = ('event', 'operation', 'address', 'set', 'tag')
+
+EVENT_BUFFER_SIZE = 1024 * 1024
+
+
+class ConsoleEventSink:
+    # Prints the classic per-access simulator messages
+    def emit(self, event, operation, address, index, tag):
+        if event == 'hit':
+            print(f"Cache HIT for {operation} at address: {hex(address)}")
+        elif event == 'miss':
+            print(f"Cache MISS for {operation} at address: {hex(address)}")
+        elif event == 'fill':
+            print(f"Loaded memory address {hex(address)} into cache set {index}")
+        elif event == 'replace':
+            print(f"Replaced line in cache set {index} with memory address {hex(address)}")
+        elif event in ('evict', 'writeback'):
+            print(f"Writing back dirty block with tag {tag} from set {index}")
+        elif event == 'flush':
+            print("\nWriting back dirty blocks to main memory...")
+
+    def close(self):
+        pass
+
+
+class CsvEventSink:
+    # Writes events as buffered CSV rows to a file
+    def __init__(self, path):
+        self.file = open(path, 'w', newline='', buffering=EVENT_BUFFER_SIZE)
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(EVENT_FIELDS)
+
+    def emit(self, event, operation, address, index, tag):
+        self.writer.writerow((event, operation, address, index, tag))
+
+    def close(self):
+        self.file.close()
+
+
+class JsonlEventSink:
+    # Writes events as buffered JSON lines to a file
+    def __init__(self, path):
+        self.file = open(path, 'w', buffering=EVENT_BUFFER_SIZE)
+
+    def emit(self, event, operation, address, index, tag):
+        self.file.write(json.dumps(dict(zip(EVENT_FIELDS, (event, operation, address, index, tag)))))
+        self.file.write("\n")
+
+    def close(self):
+        self.file.close()
+
+
+class CallbackEventSink:
+    # Hands every event to a callable taking the EVENT_FIELDS as arguments
+    def __init__(self, callback):
+        self.emit = callback
+
+    def close(self):
+        pass
+
+
+class FanoutEventSink:
+    # Forwards every event to several sinks
+    def __init__(self, sinks):
+        self.sinks = list(sinks)
+
+    def emit(self, event, operation, address, index, tag):
+        for sink in self.sinks:
+            sink.emit(event, operation, address, index, tag)
+
+    def close(self):
+        for sink in self.sinks:
+            sink.close()
+
+
+def open_event_file(path):
+    # Pick the event file format from its extension (.jsonl, otherwise CSV)
+    if path.endswith('.jsonl') or path.endswith('.json'):
+        return JsonlEventSink(path)
+    return CsvEventSink(path)
+
+
+def create_event_sink(verbosity=SUMMARY, event_file=None, callback=None):
+    # Build the sink for a run, or None when no events are wanted so that the
+    # simulator skips event generation entirely
+    sinks = []
+    if verbosity >= VERBOSE:
+        sinks.append(ConsoleEventSink())
+    if event_file:
+        sinks.append(open_event_file(event_file))
+    if callback is not None:
+        sinks.append(CallbackEventSink(callback))
+    if not sinks:
+        return None
+    if len(sinks) == 1:
+        return sinks[0]
+    return FanoutEventSink(sinks)
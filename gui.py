@@ -1,6 +1,11 @@
 import customtkinter as ctk
 from tkinter import filedialog, messagebox, Scrollbar
 from cache import CacheSimulator
+from replacement import POLICIES
+from simulation_worker import SimulationJob, SimulationWorker
+
+# How often the UI collects messages from the simulation worker (milliseconds)
+POLL_INTERVAL_MS = 100
 
 class CacheSimulatorGUI:
     def __init__(self, root):
@@ -12,6 +17,9 @@ class CacheSimulatorGUI:
         # Initialize the trace file path variable
         self.trace_file_path = ctk.StringVar()
 
+        # Simulations run on a background worker so the window stays responsive
+        self.worker = SimulationWorker()
+
         # Styling Dictionary
         self.styles = {
             "bg": "#f0f0f0",
@@ -47,6 +55,9 @@ class CacheSimulatorGUI:
         self.block_size_entry.configure(validate="key", validatecommand=vcmd)
         self.associativity_entry.configure(validate="key", validatecommand=vcmd)
 
+        # Start collecting progress and results from the worker
+        self.root.after(POLL_INTERVAL_MS, self.poll_worker)
+
     def create_neumorphic_section(self, title, create_content_function, rel_y):
         # Frame for neumorphism section
         frame = ctk.CTkFrame(self.root, corner_radius=15, width=700, height=250)
@@ -71,6 +82,12 @@ class CacheSimulatorGUI:
         self.block_size_entry = self.create_labeled_entry(parent, "Block Size (Bytes): *", 2, placeholder="Enter block size(upto 128 Bytes)")
         self.associativity_entry = self.create_labeled_entry(parent, "Associativity: *", 3, placeholder="Enter associativity(upto 8)")
 
+        policy_label = ctk.CTkLabel(parent, text="Replacement Policy:", font=ctk.CTkFont(size=14))
+        policy_label.grid(row=4, column=0, sticky='w', pady=5, padx=20)
+        self.policy_menu = ctk.CTkOptionMenu(parent, values=list(POLICIES), width=300)
+        self.policy_menu.set('lru')
+        self.policy_menu.grid(row=4, column=1, pady=5, padx=20)
+
     def create_trace_file_selector(self, parent):
         browse_button = ctk.CTkButton(parent, text="Select Memory Trace File", command=self.select_trace_file, fg_color=self.styles["button_bg"], hover_color=self.styles["highlight"], font=ctk.CTkFont(size=14, weight="bold"), width=200)
         browse_button.grid(row=1, column=0, padx=20, pady=15)
@@ -81,6 +98,19 @@ class CacheSimulatorGUI:
         reset_button = ctk.CTkButton(parent, text="Reset", command=self.reset_fields, fg_color="red", hover_color="red", font=ctk.CTkFont(size=14, weight="bold"), width=200)
         reset_button.grid(row=1, column=2, padx=20, pady=15)
 
+        cancel_button = ctk.CTkButton(parent, text="Cancel Current", command=self.worker.cancel_current, fg_color=self.styles["button_bg"], hover_color=self.styles["highlight"], font=ctk.CTkFont(size=14, weight="bold"), width=200)
+        cancel_button.grid(row=2, column=0, padx=20, pady=(0, 15))
+
+        cancel_all_button = ctk.CTkButton(parent, text="Cancel All", command=self.worker.cancel_all, fg_color=self.styles["button_bg"], hover_color=self.styles["highlight"], font=ctk.CTkFont(size=14, weight="bold"), width=200)
+        cancel_all_button.grid(row=2, column=1, padx=20, pady=(0, 15))
+
+        # Progress of the running simulation
+        self.progress_bar = ctk.CTkProgressBar(parent, width=200)
+        self.progress_bar.set(0)
+        self.progress_bar.grid(row=2, column=2, padx=20, pady=(0, 15))
+        self.status_label = ctk.CTkLabel(parent, text="Idle", font=ctk.CTkFont(size=14))
+        self.status_label.grid(row=3, column=0, columnspan=3, sticky='w', padx=20, pady=(0, 10))
+
     def create_output_section(self, parent):
         # Output frame with a scrollable frame for the text box
         output_frame = ctk.CTkScrollableFrame(parent, width=700, height=400)
@@ -139,19 +169,22 @@ class CacheSimulatorGUI:
             capacity = int(self.capacity_entry.get())
             block_size = int(self.block_size_entry.get())
             associativity = int(self.associativity_entry.get())
+            policy = self.policy_menu.get()
 
             # Validate parameters
-            CacheSimulator.validate_params(capacity, block_size, associativity)
+            CacheSimulator.validate_params(capacity, block_size, associativity, policy)
 
             # Get trace file path
             trace_file = self.trace_file_path.get()
             if not trace_file:
                 raise ValueError("Please select a memory trace file.")
 
-            # Initialize and run the cache simulator
-            simulator = CacheSimulator(capacity, block_size, associativity)
-            simulator.read_memory_trace(trace_file)
-            self.show_statistics(simulator)
+            # Queue the simulation on the background worker; several configurations can be
+            # queued and run one after another
+            job = SimulationJob(capacity, block_size, associativity, policy, trace_file)
+            self.worker.submit(job)
+            if self.worker.current_job is not None:
+                self.status_label.configure(text=f"Queued: {job.describe()} ({self.worker.pending()} waiting)")
 
         except ValueError as e:
             messagebox.showerror("Invalid Input", str(e))
@@ -161,12 +194,43 @@ class CacheSimulatorGUI:
         self.capacity_entry.delete(0, ctk.END)
         self.block_size_entry.delete(0, ctk.END)
         self.associativity_entry.delete(0, ctk.END)
+        self.policy_menu.set('lru')
         self.trace_file_path.set("")
         self.statistics_output.delete(1.0, ctk.END)
 
-    def show_statistics(self, simulator):
-        # Clear the output text area
-        self.statistics_output.delete(1.0, ctk.END)
+    def poll_worker(self):
+        # Apply the worker's messages; only the latest progress report is shown
+        progress = None
+        for message in self.worker.poll():
+            kind, job = message[0], message[1]
+            if kind == 'started':
+                self.progress_bar.set(0)
+                self.status_label.configure(text=f"Running: {job.describe()}")
+            elif kind == 'progress':
+                progress = message
+            elif kind == 'finished':
+                progress = None
+                self.progress_bar.set(1)
+                self.status_label.configure(text=f"Finished: {job.describe()}")
+                self.show_statistics(message[2], job.describe() + (" (cached result)" if message[3] else ""))
+            elif kind == 'cancelled':
+                self.status_label.configure(text=f"Cancelled: {job.describe()}")
+            elif kind == 'error':
+                self.status_label.configure(text=f"Failed: {job.describe()}")
+                messagebox.showerror("Simulation Error", message[2])
+        if progress is not None:
+            job, report = progress[1], progress[2]
+            self.progress_bar.set(report['fraction'])
+            self.status_label.configure(
+                text=f"Running: {job.describe()} - {report['accesses']:,} accesses, "
+                     f"hit rate {report['hit_rate']:.2%} (recent {report['recent_hit_rate']:.2%}), "
+                     f"{report['accesses_per_sec']:,.0f} accesses/s, {self.worker.pending()} queued")
+        self.root.after(POLL_INTERVAL_MS, self.poll_worker)
+
+    def show_statistics(self, simulator, title=None):
+        # Append the results of one run to the output text area
+        if title is not None:
+            self.statistics_output.insert(ctk.END, f"{title}\n")
 
         # Write statistics to the output text area
         for key, value in simulator.stats.items():
@@ -0,0 +1,202 @@
+import sys
+
+from cache import CacheSimulator
+from cli_parser import parse_option_values, split_args
+from trace_io import OP_STORE, read_trace
+
+# Inclusion policies between adjacent levels
+INCLUSIVE = 'inclusive'  # Every block of a level is also in all levels below it
+EXCLUSIVE = 'exclusive'  # A block lives in at most one level; lower levels hold upper-level victims
+NINE = 'nine'            # Non-inclusive non-exclusive: fills go to every level, no back-invalidation
+INCLUSION_POLICIES = (INCLUSIVE, EXCLUSIVE, NINE)
+
+DEFAULT_LATENCIES = (4, 12, 40, 80)
+DEFAULT_MEMORY_LATENCY = 200
+
+
+class CacheHierarchy:
+    # A chain of write-back cache levels (L1 first) in front of main memory. Each level
+    # is a CacheSimulator, so set/tag mapping and replacement are shared with the
+    # single-level simulator.
+    def __init__(self, levels, inclusion=NINE, latencies=None, memory_latency=DEFAULT_MEMORY_LATENCY):
+        if not levels:
+            raise ValueError("A cache hierarchy needs at least one level")
+        if inclusion not in INCLUSION_POLICIES:
+            raise ValueError(f"Invalid inclusion policy: {inclusion}")
+        if len({level.block_size for level in levels}) != 1:
+            raise ValueError("All levels of a cache hierarchy must use the same block size")
+        latencies = DEFAULT_LATENCIES[:len(levels)] if latencies is None else tuple(latencies)
+        if len(latencies) != len(levels):
+            raise ValueError("Give one hit latency per cache level")
+
+        self.levels = list(levels)
+        self.inclusion = inclusion
+        self.latencies = latencies
+        self.memory_latency = memory_latency
+        self.level_stats = [{'cache_hits': 0, 'cache_misses': 0, 'dirty_writebacks': 0} for _ in self.levels]
+        self.stats = {'accesses': 0, 'memory_reads': 0, 'memory_writes': 0, 'total_latency': 0}
+        # Latency of an access served by level n (index len(levels) is main memory)
+        self.service_latency = [sum(latencies[:n + 1]) for n in range(len(levels))]
+        self.service_latency.append(sum(latencies) + memory_latency)
+
+    def process_records(self, records, write_back=True):
+        # Like CacheSimulator.process_records, dirty lines are written back at the end
+        # unless more of the trace follows (write_back=False)
+        access = self.access
+        for operation, address, _ in records:
+            access(address, operation == OP_STORE)
+        if write_back:
+            self.write_back_dirty_blocks()
+
+    def access(self, address, is_write):
+        # Look the block up level by level until it is found or memory is reached
+        levels = self.levels
+        level_stats = self.level_stats
+        hit_level = len(levels)
+        for level_number, cache in enumerate(levels):
+            index, tag = cache.extract_index_and_tag(address)
+            slot = cache.lookup.get(tag * cache.num_sets + index)
+            if slot is not None:
+                level_stats[level_number]['cache_hits'] += 1
+                if cache.policy_touch is not None:
+                    cache.policy_touch(index, slot)
+                hit_level = level_number
+                break
+            level_stats[level_number]['cache_misses'] += 1
+
+        self.stats['accesses'] += 1
+        self.stats['total_latency'] += self.service_latency[hit_level]
+        if hit_level == len(levels):
+            self.stats['memory_reads'] += 1
+
+        if hit_level == 0:
+            if is_write:
+                levels[0].dirty[slot] = True
+            return
+        if self.inclusion == EXCLUSIVE:
+            # Move the block up from the level that had it, pushing victims downwards
+            dirty = False
+            if hit_level < len(levels):
+                dirty = levels[hit_level].invalidate_line(index, slot)
+            self.install_exclusive(address, dirty or is_write)
+        else:
+            # Fill every level above the one that had the block, lowest first
+            for level_number in range(hit_level - 1, -1, -1):
+                cache = levels[level_number]
+                index, tag = cache.extract_index_and_tag(address)
+                evicted = cache.fill_line(index, tag, is_write and level_number == 0)
+                if evicted is not None:
+                    self.evict(level_number, *evicted)
+
+    def install_exclusive(self, address, dirty):
+        # Place a block in L1; each level's victim moves into the level below it
+        for level_number, cache in enumerate(self.levels):
+            index, tag = cache.extract_index_and_tag(address)
+            evicted = cache.fill_line(index, tag, dirty)
+            if evicted is None:
+                return
+            address, dirty = evicted
+            if dirty:
+                self.level_stats[level_number]['dirty_writebacks'] += 1
+        if dirty:
+            self.stats['memory_writes'] += 1
+
+    def evict(self, level_number, address, dirty):
+        # Handle a victim of an inclusive or NINE level
+        if self.inclusion == INCLUSIVE:
+            # Back-invalidate upper copies; a dirty upper copy makes the victim dirty
+            for cache in self.levels[:level_number]:
+                index, tag = cache.extract_index_and_tag(address)
+                slot = cache.find_line(index, tag)
+                if slot is not None and cache.invalidate_line(index, slot):
+                    dirty = True
+        if dirty:
+            self.write_back(level_number, address)
+
+    def write_back(self, level_number, address):
+        # Write a dirty block of a level back to the nearest lower level holding it, else to memory
+        self.level_stats[level_number]['dirty_writebacks'] += 1
+        for cache in self.levels[level_number + 1:]:
+            index, tag = cache.extract_index_and_tag(address)
+            slot = cache.find_line(index, tag)
+            if slot is not None:
+                cache.dirty[slot] = True
+                return
+        self.stats['memory_writes'] += 1
+
+    def write_back_dirty_blocks(self):
+        # End of trace: push the dirty lines down level by level, L1 first, so that every
+        # dirty block reaches memory exactly once
+        for level_number, cache in enumerate(self.levels):
+            ways = cache.associativity
+            for slot in range(cache.num_lines):
+                if cache.valid[slot] and cache.dirty[slot]:
+                    cache.dirty[slot] = False
+                    self.write_back(level_number, cache.block_address(slot // ways, cache.tags[slot]))
+
+    def amat(self):
+        # Average memory access time in cycles over the accesses simulated so far
+        accesses = self.stats['accesses']
+        return self.stats['total_latency'] / accesses if accesses else 0
+
+    def report(self):
+        # Per-level statistics plus memory traffic and AMAT
+        lines = []
+        for level_number, (cache, stats) in enumerate(zip(self.levels, self.level_stats)):
+            lookups = stats['cache_hits'] + stats['cache_misses']
+            miss_rate = stats['cache_misses'] / lookups if lookups else 0
+            lines.append(f"L{level_number + 1} ({cache.capacity} KB, {cache.block_size} B blocks, "
+                         f"{cache.associativity}-way, {cache.policy_name}): Hits: {stats['cache_hits']} "
+                         f"Misses: {stats['cache_misses']} Miss rate: {miss_rate:.6f} "
+                         f"Dirty writebacks: {stats['dirty_writebacks']}")
+        lines.append(f"Memory reads: {self.stats['memory_reads']} Memory writes: {self.stats['memory_writes']}")
+        lines.append(f"AMAT: {self.amat():.2f} cycles")
+        return "\n".join(lines)
+
+
+def parse_levels(spec, policy='lru'):
+    # "32:64:8,256:64:8" -> one CacheSimulator per capacity:blocksize:associativity triple
+    levels = []
+    for level_spec in spec.split(','):
+        try:
+            capacity, block_size, associativity = (int(value) for value in level_spec.split(':'))
+        except ValueError:
+            raise ValueError(f"Invalid cache level: {level_spec}")
+        if not all(value > 0 and value & (value - 1) == 0 for value in (capacity, block_size, associativity)):
+            raise ValueError(f"Invalid cache level: {level_spec} (sizes and associativity must be powers of two)")
+        if capacity * 1024 < block_size * associativity:
+            raise ValueError(f"Invalid cache level: {level_spec} (fewer than one set)")
+        levels.append(CacheSimulator(capacity, block_size, associativity, policy=policy))
+    return levels
+
+
+def print_usage():
+    print("Usage: python hierarchy.py -l<levels> [-i<inclusion>] [-t<latencies>] [-m<memory_latency>] "
+          "[-r<policy>] [trace_file]")
+    print("  -l<levels>: comma separated capacity:blocksize:associativity per level, L1 first, "
+          "e.g. -l32:64:8,256:64:8")
+    print("  -i<inclusion>: inclusive, exclusive or nine (default)")
+    print("  -t<latencies>: comma separated hit latency per level in cycles (default: 4,12,40,80)")
+    print(f"  -m<memory_latency>: main memory latency in cycles (default: {DEFAULT_MEMORY_LATENCY})")
+    print("  -r<policy>: replacement policy for every level (default: lru)")
+
+
+if __name__ == "__main__":
+    try:
+        options, positional = split_args(sys.argv[1:])
+        params = parse_option_values(options, string_params=('l', 'i', 't', 'r'))
+        if set(params) - {'l', 'i', 't', 'm', 'r'} or 'l' not in params or len(positional) > 1:
+            print_usage()
+            raise ValueError("Invalid arguments")
+        trace_file_path = positional[0] if positional else "memory_trace1.txt"
+
+        levels = parse_levels(params['l'], params.get('r', 'lru'))
+        latencies = [int(value) for value in params['t'].split(',')] if 't' in params else None
+        hierarchy = CacheHierarchy(levels, params.get('i', NINE), latencies,
+                                   params.get('m', DEFAULT_MEMORY_LATENCY))
+        hierarchy.process_records(read_trace(trace_file_path))
+        print(hierarchy.report())
+    except FileNotFoundError as e:
+        print(f"Error: The file '{e.filename}' was not found.")
+    except ValueError as e:
+        print(f"Error: {e}")
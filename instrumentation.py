@@ -0,0 +1,133 @@
+import json
+import time
+from contextlib import contextmanager
+from itertools import islice
+
+from stack_distance import FullyAssociativeStackDistance
+from trace_io import read_trace
+
+# Optional instrumentation layer. It is an event sink (see events.py), so a simulator
+# without one pays nothing; when attached it keeps per-set histograms, splits misses
+# into compulsory, capacity and conflict misses using a shadow fully-associative LRU
+# cache of the same size, and collects reuse distances and phase timings.
+
+# Records parsed at a time when timing parsing and simulation separately
+PARSE_CHUNK = 65536
+HOTTEST_SETS = 10
+
+
+class Instrumentation:
+    def __init__(self, simulator):
+        self.simulator = simulator
+        num_sets = simulator.num_sets
+        self.set_hits = [0] * num_sets
+        self.set_misses = [0] * num_sets
+        self.set_evictions = [0] * num_sets
+        self.set_dirty_evictions = [0] * num_sets
+        self.compulsory_misses = 0
+        self.capacity_misses = 0
+        self.conflict_misses = 0
+        # The shadow cache only needs LRU stack distances: an access hits in a
+        # fully-associative LRU cache of N lines exactly when its distance is below N
+        self.shadow = FullyAssociativeStackDistance()
+        self.phases = {}
+        self.store_retry = False
+
+    def emit(self, event, operation, address, index, tag):
+        if event == 'hit':
+            self.set_hits[index] += 1
+            if self.store_retry:
+                # Hit of the store retried after a miss; the access was already counted
+                self.store_retry = False
+                return
+            self.shadow.access(tag * self.simulator.num_sets + index)
+        elif event == 'miss':
+            self.set_misses[index] += 1
+            self.store_retry = operation == 'STORE'
+            distance = self.shadow.access(tag * self.simulator.num_sets + index)
+            if distance is None:
+                self.compulsory_misses += 1
+            elif distance >= self.simulator.num_lines:
+                self.capacity_misses += 1
+            else:
+                self.conflict_misses += 1
+        elif event == 'replace':
+            self.set_evictions[index] += 1
+        elif event == 'evict':
+            self.set_dirty_evictions[index] += 1
+
+    def close(self):
+        pass
+
+    @contextmanager
+    def phase(self, name):
+        # Accumulate the wall-clock time spent in a named phase
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - start
+
+    def run_trace(self, trace_file_path, start=0):
+        # Simulate a trace in chunks, timing parsing and simulation separately, optionally
+        # from record `start` on (as when resuming from a checkpoint)
+        simulator = self.simulator
+        try:
+            records = read_trace(trace_file_path, start)
+            while True:
+                with self.phase('parse'):
+                    chunk = list(islice(records, PARSE_CHUNK))
+                if not chunk:
+                    break
+                with self.phase('simulate'):
+                    simulator.process_records(chunk, write_back=False)
+        except FileNotFoundError:
+            print(f"Error: The file '{trace_file_path}' was not found.")
+            return
+        with self.phase('write_back'):
+            simulator.write_back_dirty_blocks()
+
+    def reuse_distance_histogram(self):
+        # Reuse distances in power-of-two buckets: [0, 1), [1, 2), [2, 4), [4, 8), ...
+        buckets = {}
+        for distance, count in self.shadow.distances.items():
+            bucket = distance.bit_length()
+            buckets[bucket] = buckets.get(bucket, 0) + count
+        return [{'min': 0 if bucket == 0 else 1 << (bucket - 1), 'max': 1 << bucket if bucket else 1,
+                 'count': buckets[bucket]} for bucket in sorted(buckets)]
+
+    def hottest_sets(self, count=HOTTEST_SETS):
+        # The sets with the most misses, which are the ones thrashing
+        order = sorted(range(len(self.set_misses)), key=lambda index: (-self.set_misses[index], index))
+        return [{'set': index, 'hits': self.set_hits[index], 'misses': self.set_misses[index],
+                 'evictions': self.set_evictions[index]} for index in order[:count] if self.set_misses[index]]
+
+    def report(self):
+        simulator = self.simulator
+        return {
+            'config': {'capacity': simulator.capacity, 'block_size': simulator.block_size,
+                       'associativity': simulator.associativity, 'policy': simulator.policy_name,
+                       'num_sets': simulator.num_sets},
+            'stats': dict(simulator.stats),
+            'miss_breakdown': {'compulsory': self.compulsory_misses, 'capacity': self.capacity_misses,
+                               'conflict': self.conflict_misses},
+            'reuse_distance': self.reuse_distance_histogram(),
+            'hottest_sets': self.hottest_sets(),
+            'per_set': {'hits': self.set_hits, 'misses': self.set_misses, 'evictions': self.set_evictions,
+                        'dirty_evictions': self.set_dirty_evictions},
+            'phases': self.phases,
+        }
+
+    def write_json(self, path):
+        with open(path, 'w') as report_file:
+            json.dump(self.report(), report_file, indent=2)
+
+    def print_summary(self):
+        print("\nMiss Breakdown:")
+        print(f"compulsory: {self.compulsory_misses}")
+        print(f"capacity: {self.capacity_misses}")
+        print(f"conflict: {self.conflict_misses}")
+        hottest = self.hottest_sets(3)
+        if hottest:
+            print("Most missed sets: " + ", ".join(f"{row['set']:02X} ({row['misses']} misses)" for row in hottest))
+        print("Phase times: " + ", ".join(f"{name} {seconds:.3f}s" for name, seconds in self.phases.items()))
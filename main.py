@@ -1,19 +1,109 @@
 import sys
+from functools import partial
+
+import batch
+import parallel
 from cache import CacheSimulator
-from cli_parser import parse_params
+from checkpoint import load_checkpoint, run_with_checkpoints
+from cli_parser import parse_options, parse_params
+from events import SUMMARY, FanoutEventSink, create_event_sink
+from instrumentation import Instrumentation
+from results_cache import open_results_cache
+from sampling import SAMPLING_MODES, SET_SAMPLING, print_estimates, simulate_set_sample, simulate_time_sample
+from trace_io import read_trace
 
 if __name__ == "__main__":
     try:
         # Parse command-line arguments
         capacity, block_size, associativity = parse_params(sys.argv[1:])
-        CacheSimulator.validate_params(capacity, block_size, associativity)
+        options = parse_options(sys.argv[1:])
+        CacheSimulator.validate_params(capacity, block_size, associativity, options['r'])
+        if options['i'] <= 0:
+            raise ValueError(f"Invalid checkpoint interval: {options['i']}")
+
+        if options['m'] in SAMPLING_MODES:
+            # Sampled simulation only estimates the statistics; there are no cache contents to write
+            if options['e'] is not None or options['k'] is not None or options['l'] is not None or \
+                    options['p'] is not None:
+                raise ValueError("Sampled simulation does not support event files, checkpoints or profiling")
+            config = (capacity, block_size, associativity, options['r'], options['s'])
+            trace_file_path = options['trace'] or "memory_trace1.txt"
+            try:
+                if options['m'] == SET_SAMPLING:
+                    estimates = simulate_set_sample(config, trace_file_path, options['f'])
+                else:
+                    estimates = simulate_time_sample(config, trace_file_path, options['f'], options['w'], options['u'])
+            except FileNotFoundError:
+                print(f"Error: The file '{trace_file_path}' was not found.")
+                sys.exit(1)
+            if options['v'] >= SUMMARY:
+                print_estimates(estimates)
+                print(f"Cache Configuration: Capacity: {capacity} KB, Block Size: {block_size} Bytes, Associativity: {associativity}, Replacement Policy: {options['r']}")
+            sys.exit(0)
+        if options['m'] != 'exact':
+            raise ValueError(f"Invalid simulation mode: {options['m']}")
+        if options['j'] > 1 and (options['k'] is not None or options['l'] is not None):
+            # Worker processes always start from an empty cache and cannot be checkpointed
+            raise ValueError("Multi-process simulation (-j) cannot be combined with checkpoints (-k, -l)")
+        if options['p'] is not None and (options['j'] > 1 or options['k'] is not None):
+            # Profiling needs every event in order and times the phases of its own trace loop
+            raise ValueError("Profiling (-p) cannot be combined with multi-process simulation (-j) or checkpoints (-k)")
 
-        # Initialize the simulator
-        simulator = CacheSimulator(capacity, block_size, associativity)
+        # Initialize the simulator; events are only generated when requested
+        events = create_event_sink(options['v'], options['e'])
+        trace_file_path = options['trace']
+        trace_offset = 0
+        if options['l'] is not None:
+            # Resume from a checkpoint. The same trace continues where it stopped; any other
+            # trace starts from the beginning on the checkpointed (warmed-up) cache.
+            try:
+                simulator, trace_file_path, trace_offset = load_checkpoint(options['l'], events, trace_file_path)
+            except FileNotFoundError:
+                print(f"Error: The file '{options['l']}' was not found.")
+                if events is not None:
+                    events.close()
+                sys.exit(1)
+            if (simulator.capacity, simulator.block_size, simulator.associativity, simulator.policy_name) != \
+                    (capacity, block_size, associativity, options['r']):
+                raise ValueError(f"Checkpoint {options['l']} was saved with a different cache configuration")
+        else:
+            simulator = CacheSimulator(capacity, block_size, associativity, events=events,
+                                       policy=options['r'], seed=options['s'])
 
-        # Run the memory trace processing (using provided memory trace file)
-        trace_file_path = sys.argv[4] if len(sys.argv) > 4 else "memory_trace1.txt"
-        simulator.read_memory_trace(trace_file_path)
+        # Optional instrumentation, fed by the same events as any other sink
+        instrumentation = None
+        if options['p'] is not None:
+            instrumentation = Instrumentation(simulator)
+            simulator.events = instrumentation if events is None else FanoutEventSink([events, instrumentation])
+
+        # Run the memory trace processing (using provided memory trace file, "-" for stdin)
+        trace_file_path = trace_file_path or "memory_trace1.txt"
+        try:
+            if instrumentation is not None:
+                instrumentation.run_trace(trace_file_path, trace_offset)
+            elif options['k'] is not None or trace_offset:
+                try:
+                    run_with_checkpoints(simulator, read_trace(trace_file_path, trace_offset), options['k'],
+                                         options['i'], trace_file_path, trace_offset)
+                except FileNotFoundError:
+                    print(f"Error: The file '{trace_file_path}' was not found.")
+            else:
+                if options['j'] > 1:
+                    simulate = partial(parallel.read_memory_trace, simulator, trace_file_path, options['j'])
+                else:
+                    simulate = partial(batch.read_memory_trace, simulator, trace_file_path)
+                # Results are reused when the same trace was already simulated with the same
+                # configuration from an empty cache; runs that stream events or resume from a
+                # checkpoint always simulate
+                use_results_cache = simulator.events is None and options['l'] is None
+                results_cache = open_results_cache(options['d']) if use_results_cache else None
+                if results_cache is not None:
+                    results_cache.simulate(simulator, trace_file_path, simulate)
+                else:
+                    simulate()
+        finally:
+            if events is not None:
+                events.close()
 
         # Prepare the output content
         output_content = []
@@ -32,21 +122,25 @@ if __name__ == "__main__":
         output_content.append("CACHE CONTENTS")
         output_content.append("Set   V    Tag    Dirty    Word0      Word1      Word2      Word3      Word4      Word5      Word6      Word7")
 
-        for index, cache_set in enumerate(simulator.cache):
-            for line in cache_set:
-                if line['valid']:
-                    line_data = f"{index:02X}     1   {line['tag']:08X}    {'1' if line['dirty'] else '0'}    " + "   ".join(
-                        [f"{word:08X}" for word in line['data']]
-                    )
-                    output_content.append(line_data)
+        for index, way, tag, dirty, data in simulator.iter_cache_lines():
+            line_data = f"{index:02X}     1   {tag:08X}    {'1' if dirty else '0'}    {data:08X}"
+            output_content.append(line_data)
 
         # Write to the output file
         output_file_path = "sample_output_file.txt"
         with open(output_file_path, 'w') as output_file:
             output_file.write("\n".join(output_content))
 
-        print(f"Output written to {output_file_path}")
-        print(f"Cache Configuration: Capacity: {capacity} KB, Block Size: {block_size} Bytes, Associativity: {associativity}")
+        if options['v'] >= SUMMARY:
+            simulator.print_statistics()
+            print(f"Output written to {output_file_path}")
+            print(f"Cache Configuration: Capacity: {capacity} KB, Block Size: {block_size} Bytes, Associativity: {associativity}, Replacement Policy: {options['r']}")
+
+        if instrumentation is not None:
+            instrumentation.write_json(options['p'])
+            if options['v'] >= SUMMARY:
+                instrumentation.print_summary()
+                print(f"Instrumentation report written to {options['p']}")
 
     except ValueError as e:
         print(f"Error: {e}")
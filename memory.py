@@ -1,6 +1,84 @@
+import mmap
+from array import array
+
+# Main memory is word addressed with 4-byte words, grouped into 4 KB pages
+WORD_SIZE = 4
+PAGE_SHIFT = 10
+PAGE_WORDS = 1 << PAGE_SHIFT
+PAGE_MASK = PAGE_WORDS - 1
+
+
 class MainMemory:
+    # Sparse main memory where every word defaults to its own address. Reads of
+    # untouched words compute that default on demand and pages are only allocated
+    # when first written, so memory use is proportional to the touched footprint.
+    def __init__(self, size_mb=16):
+        self.size = size_mb * 1024 * 1024 // WORD_SIZE  # Size in 4-byte words
+        self.pages = {}
+
     @staticmethod
     def initialize_main_memory(size_mb=16):
         # Initialize main memory with given size in MB, where each word is set to its address value
-        memory_size = size_mb * 1024 * 1024 // 4  # Size in 4-byte words
-        return [i for i in range(memory_size)]
+        return MainMemory(size_mb)
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, address):
+        if not 0 <= address < self.size:
+            raise IndexError(f"Memory address out of range: {hex(address)}")
+        page = self.pages.get(address >> PAGE_SHIFT)
+        if page is None:
+            return address
+        return page[address & PAGE_MASK]
+
+    def __setitem__(self, address, value):
+        if not 0 <= address < self.size:
+            raise IndexError(f"Memory address out of range: {hex(address)}")
+        page_number = address >> PAGE_SHIFT
+        page = self.pages.get(page_number)
+        if page is None:
+            start = page_number << PAGE_SHIFT
+            page = array('I', range(start, start + PAGE_WORDS))
+            self.pages[page_number] = page
+        page[address & PAGE_MASK] = value
+
+
+class MappedMainMemory:
+    # Main memory backed by a memory-mapped scratch file, for address spaces too
+    # large to keep in RAM. The file is created sparse; a page is filled with its
+    # default "word equals address" values the first time it is written.
+    def __init__(self, path, size_mb=16):
+        self.size = size_mb * 1024 * 1024 // WORD_SIZE
+        self.path = path
+        num_pages = (self.size + PAGE_MASK) >> PAGE_SHIFT
+        self.initialized = bytearray(num_pages)
+        with open(path, 'w+b') as backing_file:
+            backing_file.truncate(num_pages * PAGE_WORDS * WORD_SIZE)
+            self.mapping = mmap.mmap(backing_file.fileno(), 0)
+        self.words = memoryview(self.mapping).cast('I')
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, address):
+        if not 0 <= address < self.size:
+            raise IndexError(f"Memory address out of range: {hex(address)}")
+        if not self.initialized[address >> PAGE_SHIFT]:
+            return address
+        return self.words[address]
+
+    def __setitem__(self, address, value):
+        if not 0 <= address < self.size:
+            raise IndexError(f"Memory address out of range: {hex(address)}")
+        page_number = address >> PAGE_SHIFT
+        if not self.initialized[page_number]:
+            start = page_number << PAGE_SHIFT
+            self.words[start:start + PAGE_WORDS] = array('I', range(start, start + PAGE_WORDS))
+            self.initialized[page_number] = True
+        self.words[address] = value
+
+    def close(self):
+        # Release the mapping; the scratch file is left on disk
+        self.words.release()
+        self.mapping.close()
@@ -0,0 +1,120 @@
+import os
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import batch
+from cache import CacheSimulator
+from sweep import load_trace_arrays
+
+# Sets never interact, so a trace can be split by set index into independent shards.
+# Shard k holds every access whose set index is congruent to k modulo the number of
+# workers, in trace order. The shards are laid out one after the other in a single
+# shared memory segment (all addresses, then all data words, then all operation
+# bytes) that the worker processes map instead of receiving copies.
+
+
+def partition_by_set(trace, block_size, num_sets, workers):
+    # Reorder the trace so that each shard is contiguous; returns the reordered
+    # (operations, addresses, data) buffers and the number of accesses per shard
+    operations, addresses, data = trace
+    if batch.numpy is not None:
+        numpy = batch.numpy
+        address_array = numpy.frombuffer(addresses, dtype=numpy.uint64)
+        indices, _ = batch.decode_addresses(address_array, block_size, num_sets)
+        shards = (indices % workers).astype(numpy.intp)
+        order = numpy.argsort(shards, kind='stable')
+        counts = numpy.bincount(shards, minlength=workers).tolist()
+        return (numpy.frombuffer(operations, dtype=numpy.uint8)[order].tobytes(), address_array[order].tobytes(),
+                numpy.frombuffer(data, dtype=numpy.uint64)[order].tobytes()), counts
+
+    buckets = [[] for _ in range(workers)]
+    for position, address in enumerate(addresses):
+        buckets[(address // block_size) % num_sets % workers].append(position)
+    order = [position for bucket in buckets for position in bucket]
+    reordered = (bytes(operations[position] for position in order),
+                 array('Q', (addresses[position] for position in order)).tobytes(),
+                 array('Q', (data[position] for position in order)).tobytes())
+    return reordered, [len(bucket) for bucket in buckets]
+
+
+def simulate_shard(segment_name, total, start, count, config):
+    # Worker: simulate one shard straight out of the shared memory segment and return
+    # the resulting simulator, whose cache only holds the shard's sets
+    capacity, block_size, associativity, policy, seed = config
+    segment = shared_memory.SharedMemory(name=segment_name)
+    views = []
+    try:
+        addresses = segment.buf[8 * start:8 * (start + count)].cast('Q')
+        data = segment.buf[8 * (total + start):8 * (total + start + count)].cast('Q')
+        operations = segment.buf[16 * total + start:16 * total + start + count]
+        views = [addresses, data, operations]
+        simulator = CacheSimulator(capacity, block_size, associativity, policy=policy, seed=seed)
+        batch.process_trace_arrays(simulator, operations, addresses, data)
+        return simulator
+    finally:
+        for view in views:
+            view.release()
+        segment.close()
+
+
+def merge_shard(simulator, shard_simulator, shard, workers):
+    # Copy the sets owned by one shard, including their replacement state, into the
+    # simulator and add up the statistics
+    ways = simulator.associativity
+    policy = simulator.policy
+    shard_policy = shard_simulator.policy
+    for index in range(shard, simulator.num_sets, workers):
+        lines = slice(index * ways, (index + 1) * ways)
+        simulator.valid[lines] = shard_simulator.valid[lines]
+        simulator.dirty[lines] = shard_simulator.dirty[lines]
+        simulator.tags[lines] = shard_simulator.tags[lines]
+        simulator.data[lines] = shard_simulator.data[lines]
+        for field in policy.set_fields:
+            getattr(policy, field)[index] = getattr(shard_policy, field)[index]
+        for field in policy.line_fields:
+            getattr(policy, field)[lines] = getattr(shard_policy, field)[lines]
+    for key, value in shard_simulator.stats.items():
+        simulator.stats[key] += value
+
+
+def process_trace_parallel(simulator, trace, workers=None):
+    # Simulate a trace (operations, addresses, data buffers) on a fresh simulator using one
+    # process per shard. Statistics and final cache contents match a serial run exactly,
+    # end-of-trace write-backs included.
+    workers = min(workers or os.cpu_count() or 1, simulator.num_sets)
+    if workers <= 1 or simulator.events is not None:
+        batch.process_trace_arrays(simulator, *trace)
+        return
+
+    (operations, addresses, data), counts = partition_by_set(trace, simulator.block_size, simulator.num_sets,
+                                                           workers)
+    total = len(operations)
+    segment = shared_memory.SharedMemory(create=True, size=max(17 * total, 1))
+    try:
+        segment.buf[:8 * total] = addresses
+        segment.buf[8 * total:16 * total] = data
+        segment.buf[16 * total:17 * total] = operations
+        config = (simulator.capacity, simulator.block_size, simulator.associativity, simulator.policy_name,
+                  simulator.seed)
+        starts = [sum(counts[:shard]) for shard in range(workers)]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            shard_simulators = list(pool.map(simulate_shard, [segment.name] * workers, [total] * workers,
+                                             starts, counts, [config] * workers))
+    finally:
+        segment.close()
+        segment.unlink()
+
+    for shard, shard_simulator in enumerate(shard_simulators):
+        merge_shard(simulator, shard_simulator, shard, workers)
+    simulator.rebuild_lookup()
+
+
+def read_memory_trace(simulator, trace_file_path, workers=None, hasher=None):
+    # Parallel equivalent of CacheSimulator.read_memory_trace
+    try:
+        trace = load_trace_arrays(trace_file_path, hasher)
+    except FileNotFoundError:
+        print(f"Error: The file '{trace_file_path}' was not found.")
+        return
+    process_trace_parallel(simulator, trace, workers)
@@ -0,0 +1,234 @@
+from array import array
+
+# Replacement policies keep their per-set and per-line state in flat arrays. Lines are
+# addressed by slot (set * associativity + way), like the cache arrays themselves.
+#
+# The simulator calls
+#   touch(index, slot)  on a hit (policies whose state hits never change set touch = None)
+#   insert(index, slot) when a line is filled
+#   victim(index)       when the set is full, returning the slot to evict
+#   remove(index, slot) when a line is invalidated
+# set_fields and line_fields name the state arrays with one entry per set and per line.
+# repeat_hit_stable is True when hitting the line that was just accessed leaves the
+# state unchanged, which lets batched simulation count such repeats without replaying them.
+
+
+class LRUPolicy:
+    # True LRU as a doubly linked recency list per set: O(1) promotion and victim selection
+    name = 'lru'
+    set_fields = ('head', 'tail')
+    line_fields = ('prev', 'next')
+    repeat_hit_stable = True
+
+    def __init__(self, num_sets, associativity, seed=0):
+        self.head = array('l', [-1]) * num_sets  # Most recently used line of each set
+        self.tail = array('l', [-1]) * num_sets  # Least recently used line of each set
+        self.prev = array('l', [-1]) * (num_sets * associativity)
+        self.next = array('l', [-1]) * (num_sets * associativity)
+
+    def touch(self, index, slot):
+        head = self.head[index]
+        if head != slot:
+            prev = self.prev
+            next = self.next
+            before = prev[slot]
+            after = next[slot]
+            next[before] = after
+            if after == -1:
+                self.tail[index] = before
+            else:
+                prev[after] = before
+            prev[slot] = -1
+            next[slot] = head
+            prev[head] = slot
+            self.head[index] = slot
+
+    def insert(self, index, slot):
+        head = self.head[index]
+        self.prev[slot] = -1
+        self.next[slot] = head
+        if head == -1:
+            self.tail[index] = slot
+        else:
+            self.prev[head] = slot
+        self.head[index] = slot
+
+    def victim(self, index):
+        slot = self.tail[index]
+        self.remove(index, slot)
+        return slot
+
+    def remove(self, index, slot):
+        before = self.prev[slot]
+        after = self.next[slot]
+        if before == -1:
+            self.head[index] = after
+        else:
+            self.next[before] = after
+        if after == -1:
+            self.tail[index] = before
+        else:
+            self.prev[after] = before
+
+
+class FIFOPolicy:
+    # First in, first out via a round-robin pointer per set; hits leave the state unchanged
+    name = 'fifo'
+    set_fields = ('pointer',)
+    line_fields = ()
+    repeat_hit_stable = True
+    touch = None
+
+    def __init__(self, num_sets, associativity, seed=0):
+        self.associativity = associativity
+        self.pointer = array('I', bytes(4 * num_sets))
+
+    def insert(self, index, slot):
+        pass
+
+    def victim(self, index):
+        way = self.pointer[index]
+        self.pointer[index] = (way + 1) % self.associativity
+        return index * self.associativity + way
+
+    def remove(self, index, slot):
+        pass
+
+
+class RandomPolicy:
+    # Seeded random replacement with an independent xorshift32 generator per set, so the
+    # victims of a set do not depend on what happens in other sets
+    name = 'random'
+    set_fields = ('state',)
+    line_fields = ()
+    repeat_hit_stable = True
+    touch = None
+
+    def __init__(self, num_sets, associativity, seed=0):
+        self.associativity = associativity
+        self.state = array('I', ((seed * 0x9E3779B1 + index * 0x85EBCA6B) & 0xFFFFFFFF or 1
+                                 for index in range(num_sets)))
+
+    def insert(self, index, slot):
+        pass
+
+    def victim(self, index):
+        x = self.state[index]
+        x ^= (x << 13) & 0xFFFFFFFF
+        x ^= x >> 17
+        x ^= (x << 5) & 0xFFFFFFFF
+        self.state[index] = x
+        return index * self.associativity + x % self.associativity
+
+    def remove(self, index, slot):
+        pass
+
+
+class TreePLRUPolicy:
+    # Tree pseudo-LRU: associativity - 1 direction bits per set, packed into one word.
+    # Node 1 is the root, node n has children 2n and 2n + 1, and way w is leaf
+    # associativity + w. A set bit means the pseudo-LRU side is the right child.
+    name = 'plru'
+    set_fields = ('bits',)
+    line_fields = ()
+    repeat_hit_stable = True
+
+    def __init__(self, num_sets, associativity, seed=0):
+        if associativity & (associativity - 1) or associativity > 64:
+            raise ValueError(f"Tree-PLRU needs a power-of-two associativity up to 64: {associativity}")
+        self.associativity = associativity
+        self.bits = array('Q', bytes(8 * num_sets))
+
+    def touch(self, index, slot):
+        # Point every node on the path to this way away from it
+        bits = self.bits[index]
+        node = self.associativity + slot - index * self.associativity
+        while node > 1:
+            parent = node >> 1
+            if node & 1:
+                bits &= ~(1 << parent)
+            else:
+                bits |= 1 << parent
+            node = parent
+        self.bits[index] = bits
+
+    insert = touch
+
+    def victim(self, index):
+        bits = self.bits[index]
+        node = 1
+        while node < self.associativity:
+            node = 2 * node + ((bits >> node) & 1)
+        return index * self.associativity + node - self.associativity
+
+    def remove(self, index, slot):
+        pass
+
+
+# Re-reference prediction values for 2-bit RRIP
+RRPV_MAX = 3
+RRPV_LONG = RRPV_MAX - 1
+
+# AGING_TABLES[delta] adds delta to every RRPV byte in one bytes.translate() call
+AGING_TABLES = [bytes(min(value + delta, 255) for value in range(256)) for delta in range(RRPV_MAX + 1)]
+
+
+class SRRIPPolicy:
+    # Static re-reference interval prediction (hit priority): lines are inserted with a
+    # long re-reference prediction, promoted to near-immediate on a hit, and the victim is
+    # the first line predicted distant, ageing the whole set until one is
+    name = 'srrip'
+    set_fields = ()
+    line_fields = ('rrpv',)
+    repeat_hit_stable = False  # A hit right after a fill promotes the line
+
+    def __init__(self, num_sets, associativity, seed=0):
+        self.associativity = associativity
+        self.rrpv = bytearray([RRPV_MAX]) * (num_sets * associativity)
+
+    def touch(self, index, slot):
+        self.rrpv[slot] = 0
+
+    def insert(self, index, slot):
+        self.rrpv[slot] = RRPV_LONG
+
+    def victim(self, index):
+        rrpv = self.rrpv
+        base = index * self.associativity
+        end = base + self.associativity
+        slot = rrpv.find(RRPV_MAX, base, end)
+        if slot == -1:
+            line_values = rrpv[base:end]
+            rrpv[base:end] = line_values.translate(AGING_TABLES[RRPV_MAX - max(line_values)])
+            slot = rrpv.find(RRPV_MAX, base, end)
+        return slot
+
+    def remove(self, index, slot):
+        self.rrpv[slot] = RRPV_MAX
+
+
+class BRRIPPolicy(SRRIPPolicy):
+    # Bimodal RRIP: most lines are inserted with a distant prediction and only every
+    # BIMODAL_INTERVAL-th fill of a set gets a long one, which resists thrashing
+    name = 'brrip'
+    set_fields = ('fills',)
+    BIMODAL_INTERVAL = 32
+
+    def __init__(self, num_sets, associativity, seed=0):
+        super().__init__(num_sets, associativity, seed)
+        self.fills = bytearray(num_sets)
+
+    def insert(self, index, slot):
+        fills = self.fills[index]
+        self.rrpv[slot] = RRPV_LONG if fills == 0 else RRPV_MAX
+        self.fills[index] = (fills + 1) % self.BIMODAL_INTERVAL
+
+
+POLICIES = {policy.name: policy for policy in (LRUPolicy, FIFOPolicy, RandomPolicy, TreePLRUPolicy,
+                                               SRRIPPolicy, BRRIPPolicy)}
+
+
+def create_policy(name, num_sets, associativity, seed=0):
+    if name not in POLICIES:
+        raise ValueError(f"Invalid replacement policy: {name}")
+    return POLICIES[name](num_sets, associativity, seed)
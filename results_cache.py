@@ -0,0 +1,169 @@
+import hashlib
+import json
+import os
+from array import array
+
+# Persistent cache of simulation results. A result is stored under a key derived from
+# the SHA-256 of the trace file contents, the simulator configuration and
+# RESULTS_VERSION. The content hash is computed while the trace is simulated, and a
+# small index from (path, size, modification time) to content hash lets an unchanged
+# file be recognised without reading it again.
+
+# Bump whenever a change to the simulator changes its results
+RESULTS_VERSION = 2
+
+DEFAULT_DIRECTORY = os.path.join(os.path.expanduser('~'), '.cache', 'cache-simulator')
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+# Entries kept in the file fingerprint index
+MAX_FINGERPRINTS = 4096
+FINGERPRINT_FILE = 'fingerprints.json'
+
+
+def new_hasher():
+    return hashlib.sha256()
+
+
+def simulator_config(simulator):
+    return (simulator.capacity, simulator.block_size, simulator.associativity, simulator.policy_name,
+            simulator.seed)
+
+
+def capture_result(simulator):
+    # Everything a finished run reports: the statistics and the final cache contents, plus
+    # the replacement policy state (the arrays a checkpoint saves) so a restored simulator
+    # behaves like the original if it is used further
+    policy = simulator.policy
+    return {'stats': dict(simulator.stats),
+            'lines': [[index, way, tag, int(dirty), data] for index, way, tag, dirty, data in simulator.iter_cache_lines()],
+            'policy': {field: list(getattr(policy, field)) for field in policy.set_fields + policy.line_fields}}
+
+
+def restore_result(simulator, result):
+    # Put a fresh simulator into the state a finished run left it in. Main memory is not
+    # part of a result; it only holds the data of blocks that were written back.
+    policy = simulator.policy
+    for field, values in result['policy'].items():
+        state = getattr(policy, field)
+        state[:] = bytearray(values) if isinstance(state, bytearray) else array(state.typecode, values)
+    ways = simulator.associativity
+    for index, way, tag, dirty, data in result['lines']:
+        slot = index * ways + way
+        simulator.valid[slot] = True
+        simulator.tags[slot] = tag
+        simulator.dirty[slot] = dirty
+        simulator.data[slot] = data
+    simulator.rebuild_lookup()
+    simulator.stats.update(result['stats'])
+
+
+def write_json_atomic(path, value):
+    temporary_path = f"{path}.{os.getpid()}.tmp"
+    with open(temporary_path, 'w') as output_file:
+        json.dump(value, output_file)
+    os.replace(temporary_path, path)
+
+
+class ResultsCache:
+    def __init__(self, directory=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory or DEFAULT_DIRECTORY
+        self.max_bytes = max_bytes
+        self.results_directory = os.path.join(self.directory, 'results')
+        os.makedirs(self.results_directory, exist_ok=True)
+
+    @staticmethod
+    def file_identity(stat):
+        return [stat.st_size, stat.st_mtime_ns, stat.st_ino]
+
+    def load_fingerprints(self):
+        try:
+            with open(os.path.join(self.directory, FINGERPRINT_FILE)) as fingerprint_file:
+                return json.load(fingerprint_file)
+        except (OSError, ValueError):
+            return {}
+
+    def known_fingerprint(self, trace_file_path, stat):
+        # Content hash of a trace file that has not changed since it was last hashed
+        entry = self.load_fingerprints().get(os.path.abspath(trace_file_path))
+        if entry is not None and entry[0] == self.file_identity(stat):
+            return entry[1]
+        return None
+
+    def remember_fingerprint(self, trace_file_path, stat, content_hash):
+        fingerprints = self.load_fingerprints()
+        fingerprints.pop(os.path.abspath(trace_file_path), None)
+        fingerprints[os.path.abspath(trace_file_path)] = [self.file_identity(stat), content_hash]
+        # Dicts keep insertion order, so the oldest entries come first
+        for path in list(fingerprints)[:max(len(fingerprints) - MAX_FINGERPRINTS, 0)]:
+            del fingerprints[path]
+        write_json_atomic(os.path.join(self.directory, FINGERPRINT_FILE), fingerprints)
+
+    def result_path(self, content_hash, config):
+        key = json.dumps({'trace': content_hash, 'config': list(config), 'version': RESULTS_VERSION})
+        return os.path.join(self.results_directory, hashlib.sha256(key.encode()).hexdigest() + '.json')
+
+    def get(self, content_hash, config):
+        path = self.result_path(content_hash, config)
+        try:
+            with open(path) as result_file:
+                result = json.load(result_file)
+        except (OSError, ValueError):
+            return None
+        # The modification time doubles as the last use time for LRU eviction
+        os.utime(path)
+        return result
+
+    def put(self, content_hash, config, result):
+        write_json_atomic(self.result_path(content_hash, config), result)
+        self.evict()
+
+    def evict(self):
+        # Drop the least recently used results until the cache fits in max_bytes
+        entries = []
+        for entry in os.scandir(self.results_directory):
+            if entry.name.endswith('.json'):
+                stat = entry.stat()
+                entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+
+    def simulate(self, simulator, trace_file_path, simulate):
+        # Run simulate(hasher=...) on a fresh simulator unless the result for this trace
+        # and configuration is already cached, in which case the simulator is restored
+        # from it. Returns True on a cache hit.
+        try:
+            stat = os.stat(trace_file_path)
+        except OSError:
+            simulate()
+            return False
+        config = simulator_config(simulator)
+        content_hash = self.known_fingerprint(trace_file_path, stat)
+        if content_hash is not None:
+            result = self.get(content_hash, config)
+            if result is not None:
+                restore_result(simulator, result)
+                return True
+
+        hasher = new_hasher()
+        simulate(hasher=hasher)
+        content_hash = hasher.hexdigest()
+        self.remember_fingerprint(trace_file_path, stat, content_hash)
+        self.put(content_hash, config, capture_result(simulator))
+        return False
+
+
+def open_results_cache(directory=None):
+    # The results cache, or None when it is disabled ("off") or cannot be created
+    if directory == 'off':
+        return None
+    try:
+        return ResultsCache(directory)
+    except OSError as e:
+        print(f"Warning: results cache disabled: {e}")
+        return None
@@ -0,0 +1,216 @@
+import math
+from itertools import islice
+
+import batch
+from cache import CacheSimulator
+from trace_io import OP_LOAD, is_binary_trace, read_trace
+
+# Approximate simulation for very long traces. Both modes split the simulated part of
+# the trace into independent samples (groups of sets, or windows of time), estimate the
+# miss rate as a ratio over the samples and the miss and write-back counts by scaling
+# up the sampled totals, and derive 95% confidence intervals from the spread between
+# samples.
+SET_SAMPLING = 'sets'
+TIME_SAMPLING = 'time'
+SAMPLING_MODES = (SET_SAMPLING, TIME_SAMPLING)
+
+DEFAULT_FACTOR = 10
+DEFAULT_WINDOW = 10000
+DEFAULT_WARMUP = 10000
+# Sampled sets are spread over at most this many independently simulated groups
+MAX_SET_GROUPS = 32
+# Normal approximation of the two-sided 95% quantile
+Z_95 = 1.96
+
+
+def ratio_estimate(numerators, denominators, fraction):
+    # Ratio estimator over the samples with its 95% half-width (None with fewer than two samples)
+    total = sum(denominators)
+    if total == 0:
+        return 0.0, None
+    ratio = sum(numerators) / total
+    samples = len(denominators)
+    if samples < 2:
+        return ratio, None
+    mean = total / samples
+    variance = sum((n - ratio * d) ** 2 for n, d in zip(numerators, denominators)) / (samples - 1)
+    return ratio, Z_95 * math.sqrt((1 - fraction) * variance / samples) / mean
+
+
+def total_estimate(values, fraction):
+    # Expansion estimate of a population total from per-sample totals, with its 95% half-width
+    samples = len(values)
+    if samples == 0 or fraction == 0:
+        return 0.0, None
+    estimate = sum(values) / fraction
+    if samples < 2:
+        return estimate, None
+    mean = sum(values) / samples
+    variance = sum((value - mean) ** 2 for value in values) / (samples - 1)
+    return estimate, Z_95 * (samples / fraction) * math.sqrt((1 - fraction) * variance / samples)
+
+
+def sample_accesses(stats):
+    return stats['data_reads'] + stats['data_writes']
+
+
+def summarize(mode, factor, samples, fraction, trace_accesses, simulated_accesses, extra_writebacks=0):
+    # samples: per-sample (cache_misses, accesses, dirty_writebacks) tuples
+    misses = [sample[0] for sample in samples]
+    accesses = [sample[1] for sample in samples]
+    writebacks = [sample[2] for sample in samples]
+    miss_rate, miss_rate_ci = ratio_estimate(misses, accesses, fraction)
+    cache_misses, cache_misses_ci = total_estimate(misses, fraction)
+    dirty_writebacks, dirty_writebacks_ci = total_estimate(writebacks, fraction)
+    return {
+        'mode': mode,
+        'factor': factor,
+        'samples': len(samples),
+        'trace_accesses': trace_accesses,
+        'simulated_accesses': simulated_accesses,
+        'miss_rate': miss_rate,
+        'miss_rate_ci': miss_rate_ci,
+        'cache_misses': cache_misses,
+        'cache_misses_ci': cache_misses_ci,
+        'dirty_writebacks': dirty_writebacks + extra_writebacks,
+        'dirty_writebacks_ci': dirty_writebacks_ci,
+    }
+
+
+def simulate_set_sample(config, trace_file_path, factor=DEFAULT_FACTOR):
+    # Simulate only every factor-th set. The sampled sets are dealt round-robin into
+    # groups, each with its own simulator, and every group is one sample.
+    capacity, block_size, associativity, policy, seed = config
+    num_sets = (capacity * 1024) // (block_size * associativity)
+    if not 1 <= factor <= num_sets:
+        raise ValueError(f"Set sampling factor must be between 1 and the number of sets ({num_sets})")
+    sampled_sets = (num_sets + factor - 1) // factor
+    groups = min(MAX_SET_GROUPS, sampled_sets)
+    simulators = [CacheSimulator(capacity, block_size, associativity, policy=policy, seed=seed)
+                  for _ in range(groups)]
+
+    trace_accesses = 0
+    simulated_accesses = 0
+    if batch.numpy is not None:
+        for operations, addresses, data in batch.iter_trace_batches(trace_file_path):
+            trace_accesses += len(addresses)
+            indices, _ = batch.decode_addresses(addresses, block_size, num_sets)
+            sampled = indices % factor == 0
+            simulated_accesses += int(sampled.sum())
+            group_ids = (indices[sampled] // factor) % groups
+            operations, addresses, data = operations[sampled], addresses[sampled], data[sampled]
+            for group, simulator in enumerate(simulators):
+                selected = group_ids == group
+                batch.simulate_batch(simulator, operations[selected], addresses[selected], data[selected])
+    else:
+        for operation, address, value in read_trace(trace_file_path):
+            trace_accesses += 1
+            index = (address // block_size) % num_sets
+            if index % factor:
+                continue
+            simulated_accesses += 1
+            simulator = simulators[(index // factor) % groups]
+            if operation == OP_LOAD:
+                simulator.load_operation(address)
+            else:
+                simulator.store_operation(address, value)
+
+    samples = []
+    for simulator in simulators:
+        simulator.write_back_dirty_blocks()
+        stats = simulator.stats
+        samples.append((stats['cache_misses'], sample_accesses(stats), stats['dirty_writebacks']))
+    return summarize(SET_SAMPLING, factor, samples, sampled_sets / num_sets, trace_accesses, simulated_accesses)
+
+
+def iter_windows(trace_file_path, warmup, window, period):
+    # Yield (warm-up records, measured records, records consumed) for every period of the
+    # trace. Binary traces are sliced straight out of a memory map, so skipped records
+    # cost nothing; other traces are read and dropped record by record.
+    if batch.numpy is not None and trace_file_path != '-' and is_binary_trace(trace_file_path):
+        trace = batch.map_binary_trace(trace_file_path)
+        if trace is None:
+            return
+        for start in range(0, len(trace), period):
+            warm = trace[start:start + warmup]
+            measured = trace[start + warmup:start + warmup + window]
+            batch.check_operations(warm['operation'])
+            batch.check_operations(measured['operation'])
+            yield ((warm['operation'], warm['address'], warm['data']),
+                   (measured['operation'], measured['address'], measured['data']), min(period, len(trace) - start))
+        return
+
+    records = read_trace(trace_file_path)
+    skip = period - warmup - window
+    while True:
+        warm = list(islice(records, warmup))
+        measured = list(islice(records, window))
+        skipped = sum(1 for _ in islice(records, skip)) if len(measured) == window else 0
+        if not warm and not measured:
+            return
+        yield warm, measured, len(warm) + len(measured) + skipped
+        if skipped < skip:
+            return
+
+
+def simulate_window(simulator, window):
+    # Simulate a window from iter_windows and return its number of records
+    if isinstance(window, tuple):
+        batch.simulate_batch(simulator, *window)
+        return len(window[1])
+    batch.simulate_records(simulator, window)
+    return len(window)
+
+
+def simulate_time_sample(config, trace_file_path, factor=DEFAULT_FACTOR, window=DEFAULT_WINDOW,
+                         warmup=DEFAULT_WARMUP):
+    # Simulate one warm-up plus measurement window out of every `factor` windows' worth
+    # of the trace. The cache keeps its state between windows; only the measured part of
+    # each window counts, and each measured window is one sample.
+    if factor < 1 or window < 1 or warmup < 0:
+        raise ValueError("Time sampling needs a factor and window of at least 1 and a non-negative warm-up")
+    capacity, block_size, associativity, policy, seed = config
+    simulator = CacheSimulator(capacity, block_size, associativity, policy=policy, seed=seed)
+    stats = simulator.stats
+
+    samples = []
+    trace_accesses = 0
+    simulated_accesses = 0
+    measured_accesses = 0
+    for warm, measured, consumed in iter_windows(trace_file_path, warmup, window, factor * (warmup + window)):
+        simulated_accesses += simulate_window(simulator, warm)
+        before = dict(stats)
+        measured_count = simulate_window(simulator, measured)
+        if measured_count:
+            samples.append((stats['cache_misses'] - before['cache_misses'],
+                            sample_accesses(stats) - sample_accesses(before),
+                            stats['dirty_writebacks'] - before['dirty_writebacks']))
+        simulated_accesses += measured_count
+        measured_accesses += measured_count
+        trace_accesses += consumed
+
+    # Lines still dirty at the end are written back once, whatever the sampling
+    before = stats['dirty_writebacks']
+    simulator.write_back_dirty_blocks()
+    fraction = measured_accesses / trace_accesses if trace_accesses else 0
+    return summarize(TIME_SAMPLING, factor, samples, fraction, trace_accesses, simulated_accesses,
+                     stats['dirty_writebacks'] - before)
+
+
+def format_estimate(value, half_width, precision):
+    if half_width is None:
+        return f"{value:.{precision}f} (no confidence interval: fewer than two samples)"
+    return (f"{value:.{precision}f} +/- {half_width:.{precision}f} "
+            f"(95% CI {value - half_width:.{precision}f} .. {value + half_width:.{precision}f})")
+
+
+def print_estimates(estimates):
+    if estimates['mode'] == SET_SAMPLING:
+        print(f"\nSampled Statistics (set sampling, 1 in {estimates['factor']} sets, {estimates['samples']} groups):")
+    else:
+        print(f"\nSampled Statistics (time sampling, 1 in {estimates['factor']} windows, "
+              f"{estimates['samples']} windows measured):")
+    print(f"miss_rate: {format_estimate(estimates['miss_rate'], estimates['miss_rate_ci'], 6)}")
+    print(f"cache_misses: {format_estimate(estimates['cache_misses'], estimates['cache_misses_ci'], 0)}")
+    print(f"dirty_writebacks: {format_estimate(estimates['dirty_writebacks'], estimates['dirty_writebacks_ci'], 0)}")
+    print(f"simulated_accesses: {estimates['simulated_accesses']} of {estimates['trace_accesses']}")
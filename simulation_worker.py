@@ -0,0 +1,175 @@
+import os
+import queue
+import threading
+import time
+from functools import partial
+from itertools import islice
+
+import batch
+from cache import CacheSimulator
+from results_cache import open_results_cache
+from trace_io import read_trace
+
+# Background simulation for interactive front ends. A single worker thread runs the
+# queued jobs one after another and reports back through a message queue that the UI
+# drains from its own thread, so the UI never blocks on a simulation. Messages are
+# tuples whose first element is the kind:
+#   ('started', job)
+#   ('progress', job, progress) with progress a dict, sent at most every PROGRESS_INTERVAL
+#   ('finished', job, simulator, from_cache)
+#   ('cancelled', job)
+#   ('error', job, message)
+
+# Records simulated between checks for cancellation
+CHUNK_SIZE = 65536
+PROGRESS_INTERVAL = 0.2
+
+
+class SimulationCancelled(Exception):
+    pass
+
+
+class SimulationJob:
+    def __init__(self, capacity, block_size, associativity, policy, trace_file_path):
+        self.capacity = capacity
+        self.block_size = block_size
+        self.associativity = associativity
+        self.policy = policy
+        self.trace_file_path = trace_file_path
+        self.cancelled = threading.Event()
+
+    def describe(self):
+        return (f"{self.capacity} KB, {self.block_size} B blocks, {self.associativity}-way, {self.policy}, "
+                f"{os.path.basename(self.trace_file_path)}")
+
+
+class ProgressHasher:
+    # Counts the trace bytes read so far (as the trace readers report them to their
+    # hasher) and forwards them to the real hasher, if any
+    def __init__(self, hasher=None):
+        self.hasher = hasher
+        self.bytes_read = 0
+
+    def update(self, data):
+        # Text and binary readers pass bytes, the NumPy binary reader passes record arrays
+        self.bytes_read += memoryview(data).nbytes
+        if self.hasher is not None:
+            self.hasher.update(data)
+
+
+class SimulationWorker:
+    def __init__(self, results_cache_directory=None):
+        self.jobs = queue.Queue()
+        self.messages = queue.Queue()
+        self.current_job = None
+        self.results_cache_directory = results_cache_directory
+        self.thread = threading.Thread(target=self.run, name="simulation-worker", daemon=True)
+        self.thread.start()
+
+    def submit(self, job):
+        self.jobs.put(job)
+
+    def pending(self):
+        return self.jobs.qsize()
+
+    def cancel_current(self):
+        job = self.current_job
+        if job is not None:
+            job.cancelled.set()
+
+    def cancel_all(self):
+        # Cancel the running job and everything still queued
+        while True:
+            try:
+                self.jobs.get_nowait().cancelled.set()
+            except queue.Empty:
+                break
+        self.cancel_current()
+
+    def poll(self):
+        # Messages posted since the last poll; call this from the UI thread
+        messages = []
+        while True:
+            try:
+                messages.append(self.messages.get_nowait())
+            except queue.Empty:
+                return messages
+
+    def run(self):
+        while True:
+            job = self.jobs.get()
+            if job.cancelled.is_set():
+                self.messages.put(('cancelled', job))
+                continue
+            self.current_job = job
+            self.messages.put(('started', job))
+            try:
+                simulator, from_cache = self.simulate(job)
+                self.messages.put(('finished', job, simulator, from_cache))
+            except SimulationCancelled:
+                self.messages.put(('cancelled', job))
+            except FileNotFoundError:
+                self.messages.put(('error', job, f"The file '{job.trace_file_path}' was not found."))
+            except Exception as e:
+                # Report anything else too, so one bad job cannot stop the worker
+                self.messages.put(('error', job, str(e)))
+            finally:
+                self.current_job = None
+
+    def simulate(self, job):
+        simulator = CacheSimulator(job.capacity, job.block_size, job.associativity, policy=job.policy)
+        results_cache = open_results_cache(self.results_cache_directory)
+        if results_cache is None:
+            self.simulate_trace(job, simulator)
+            return simulator, False
+        # A cancelled run raises out of the results cache before anything is stored
+        from_cache = results_cache.simulate(simulator, job.trace_file_path,
+                                            lambda hasher=None: self.simulate_trace(job, simulator, hasher))
+        return simulator, from_cache
+
+    def iter_chunks(self, job, simulator, hasher):
+        # Yield (simulate, access count) pieces of the trace: NumPy batches when the
+        # batched path is available, otherwise lists of records
+        if batch.batch_supported(simulator):
+            for operations, addresses, data in batch.iter_trace_batches(job.trace_file_path, CHUNK_SIZE, hasher):
+                yield partial(batch.simulate_batch, simulator, operations, addresses, data), len(addresses)
+            return
+        records = read_trace(job.trace_file_path, hasher=hasher)
+        while True:
+            chunk = list(islice(records, CHUNK_SIZE))
+            if not chunk:
+                return
+            yield partial(simulator.process_records, chunk, write_back=False), len(chunk)
+
+    def simulate_trace(self, job, simulator, hasher=None):
+        # Simulate the trace in chunks, checking for cancellation and posting throttled
+        # progress with the hit rate of the accesses since the previous report
+        trace_size = os.path.getsize(job.trace_file_path)
+        progress = ProgressHasher(hasher)
+        stats = simulator.stats
+        last_report = time.perf_counter()
+        last_hits = last_misses = 0
+        processed = last_processed = 0
+        for simulate_chunk, count in self.iter_chunks(job, simulator, progress):
+            if job.cancelled.is_set():
+                raise SimulationCancelled()
+            simulate_chunk()
+            processed += count
+            now = time.perf_counter()
+            if now - last_report >= PROGRESS_INTERVAL:
+                hits = stats['cache_hits'] - last_hits
+                misses = stats['cache_misses'] - last_misses
+                self.messages.put(('progress', job, {
+                    'accesses': processed,
+                    'fraction': min(progress.bytes_read / trace_size, 1.0) if trace_size else 1.0,
+                    'hit_rate': stats['cache_hits'] / (stats['cache_hits'] + stats['cache_misses']),
+                    'recent_hit_rate': hits / (hits + misses) if hits + misses else 0.0,
+                    'accesses_per_sec': (processed - last_processed) / (now - last_report),
+                }))
+                last_report = now
+                last_processed = processed
+                last_hits = stats['cache_hits']
+                last_misses = stats['cache_misses']
+        if job.cancelled.is_set():
+            raise SimulationCancelled()
+        simulator.write_back_dirty_blocks()
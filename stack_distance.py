@@ -0,0 +1,198 @@
+import sys
+
+from cache import CacheSimulator
+from cli_parser import parse_option_values, split_args
+from sweep import write_results
+from trace_io import read_trace
+
+# LRU obeys the inclusion property: a block that hits in an LRU set with A ways also
+# hits with more ways. So one pass that records the stack distance of every access
+# (how many distinct blocks of the same set were used since its previous access)
+# gives the misses of every associativity at once, and one set of stacks per set
+# count gives the misses of every capacity.
+
+CURVE_FIELDS = ('capacity', 'block_size', 'associativity', 'num_sets', 'accesses', 'cache_misses', 'miss_rate')
+
+
+class FenwickTree:
+    # Binary indexed tree over access times, counting the times that are the most
+    # recent access of some block
+    def __init__(self, size):
+        self.size = size
+        self.tree = [0] * (size + 1)
+
+    def add(self, position, delta):
+        position += 1
+        tree = self.tree
+        size = self.size
+        while position <= size:
+            tree[position] += delta
+            position += position & -position
+
+    def prefix_sum(self, position):
+        # Sum of positions [0, position)
+        total = 0
+        tree = self.tree
+        while position > 0:
+            total += tree[position]
+            position -= position & -position
+        return total
+
+
+class SetStackDistance:
+    # Per-set LRU stacks for one set count. Associativities are small, so each stack
+    # only keeps the most recent max_ways blocks of its set; anything deeper is a miss
+    # for every supported associativity.
+    def __init__(self, num_sets, max_ways):
+        self.num_sets = num_sets
+        self.max_ways = max_ways
+        self.stacks = [[] for _ in range(num_sets)]
+        # histogram[d] counts accesses at stack distance d; histogram[max_ways] counts the rest
+        self.histogram = [0] * (max_ways + 1)
+
+    def access(self, block):
+        stack = self.stacks[block % self.num_sets]
+        try:
+            distance = stack.index(block)
+        except ValueError:
+            distance = self.max_ways
+            stack.insert(0, block)
+            if len(stack) > self.max_ways:
+                stack.pop()
+        else:
+            if distance:
+                del stack[distance]
+                stack.insert(0, block)
+        self.histogram[distance] += 1
+
+    def misses(self, ways):
+        # Accesses whose stack distance does not fit in a set of the given associativity
+        return sum(self.histogram[ways:])
+
+
+class FullyAssociativeStackDistance:
+    # Unbounded stack distances for a fully-associative LRU cache in O(log n) per access.
+    # Each block's most recent access time is marked in a Fenwick tree; the distance of
+    # a reuse is the number of marks after the block's previous access.
+    def __init__(self, initial_size=1 << 16):
+        self.last_access = {}
+        self.tree = FenwickTree(initial_size)
+        self.time = 0
+        self.cold_misses = 0
+        self.distances = {}
+
+    def access(self, block):
+        # Returns the stack distance of the access, or None for the first access to a block
+        if self.time == self.tree.size:
+            self.compact()
+        previous = self.last_access.get(block)
+        distance = None
+        if previous is None:
+            self.cold_misses += 1
+        else:
+            distance = self.tree.prefix_sum(self.time) - self.tree.prefix_sum(previous + 1)
+            self.distances[distance] = self.distances.get(distance, 0) + 1
+            self.tree.add(previous, -1)
+        self.tree.add(self.time, 1)
+        self.last_access[block] = self.time
+        self.time += 1
+        return distance
+
+    def compact(self):
+        # Renumber the live access times densely and rebuild the tree, growing it when
+        # more than half of it would be in use
+        live = sorted(self.last_access, key=self.last_access.__getitem__)
+        size = self.tree.size
+        if 2 * len(live) > size:
+            size *= 2
+        self.tree = FenwickTree(size)
+        for time, block in enumerate(live):
+            self.last_access[block] = time
+            self.tree.add(time, 1)
+        self.time = len(live)
+
+    def misses(self, num_blocks):
+        # Cold misses plus reuses deeper than the cache holds
+        return self.cold_misses + sum(count for distance, count in self.distances.items() if distance >= num_blocks)
+
+
+class MissRatioCurves:
+    # Single-pass LRU miss counts for every supported capacity and associativity of
+    # the given block sizes, plus a fully-associative reference curve
+    def __init__(self, block_sizes=CacheSimulator.VALID_BLOCK_SIZES,
+                 capacities=CacheSimulator.VALID_CAPACITIES,
+                 associativities=CacheSimulator.VALID_ASSOCIATIVITIES):
+        self.block_sizes = tuple(block_sizes)
+        self.capacities = tuple(capacities)
+        self.associativities = tuple(associativities)
+        max_ways = max(self.associativities)
+        self.accesses = 0
+        self.set_stacks = {}
+        self.full_stacks = {}
+        for block_size in self.block_sizes:
+            set_counts = sorted({(capacity * 1024) // (block_size * ways)
+                                 for capacity in self.capacities for ways in self.associativities})
+            self.set_stacks[block_size] = [SetStackDistance(num_sets, max_ways) for num_sets in set_counts]
+            self.full_stacks[block_size] = FullyAssociativeStackDistance()
+
+    def process_records(self, records):
+        analyzers = [(block_size, self.set_stacks[block_size], self.full_stacks[block_size])
+                     for block_size in self.block_sizes]
+        accesses = 0
+        for _, address, _ in records:
+            accesses += 1
+            for block_size, set_stacks, full_stack in analyzers:
+                block = address // block_size
+                for stacks in set_stacks:
+                    stacks.access(block)
+                full_stack.access(block)
+        self.accesses += accesses
+
+    def curves(self):
+        # One row per (capacity, block size, associativity); associativity 'full' is the
+        # fully-associative reference with the same capacity
+        rows = []
+        for block_size in self.block_sizes:
+            stacks_by_sets = {stacks.num_sets: stacks for stacks in self.set_stacks[block_size]}
+            for capacity in self.capacities:
+                for ways in self.associativities:
+                    num_sets = (capacity * 1024) // (block_size * ways)
+                    rows.append(self.make_row(capacity, block_size, ways, num_sets,
+                                              stacks_by_sets[num_sets].misses(ways)))
+                num_blocks = (capacity * 1024) // block_size
+                rows.append(self.make_row(capacity, block_size, 'full', 1,
+                                          self.full_stacks[block_size].misses(num_blocks)))
+        return rows
+
+    def make_row(self, capacity, block_size, associativity, num_sets, misses):
+        return {'capacity': capacity, 'block_size': block_size, 'associativity': associativity,
+                'num_sets': num_sets, 'accesses': self.accesses, 'cache_misses': misses,
+                'miss_rate': misses / self.accesses if self.accesses else 0}
+
+
+def print_usage():
+    print("Usage: python stack_distance.py [-b<blocksize>] [-o<output_file>] [trace_file]")
+    print("  -b<blocksize>: analyze a single block size (default: every valid block size)")
+    print("  -o<output_file>: .json or .csv results file (default: CSV on stdout)")
+    print("  trace_file: memory trace to analyze (default: memory_trace1.txt)")
+
+
+if __name__ == "__main__":
+    try:
+        options, positional = split_args(sys.argv[1:])
+        params = parse_option_values(options, string_params=('o',))
+        if set(params) - {'b', 'o'} or len(positional) > 1:
+            print_usage()
+            raise ValueError("Invalid arguments")
+        if 'b' in params and not CacheSimulator.is_valid_block_size(params['b']):
+            raise ValueError(f"Invalid block size value: {params['b']}")
+        trace_file_path = positional[0] if positional else "memory_trace1.txt"
+
+        block_sizes = (params['b'],) if 'b' in params else CacheSimulator.VALID_BLOCK_SIZES
+        analysis = MissRatioCurves(block_sizes)
+        analysis.process_records(read_trace(trace_file_path))
+        write_results(analysis.curves(), params.get('o'), fields=CURVE_FIELDS)
+    except FileNotFoundError as e:
+        print(f"Error: The file '{e.filename}' was not found.")
+    except ValueError as e:
+        print(f"Error: {e}")
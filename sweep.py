@@ -0,0 +1,151 @@
+import csv
+import json
+import os
+import sys
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from itertools import product
+
+import batch
+from cache import CacheSimulator
+from cli_parser import parse_option_values, split_args
+from results_cache import capture_result, new_hasher, open_results_cache
+from trace_io import read_trace
+
+RESULT_FIELDS = ('capacity', 'block_size', 'associativity', 'num_sets', 'cache_hits', 'cache_misses',
+                 'data_reads', 'data_writes', 'dirty_writebacks', 'miss_rate')
+
+# Trace shared with the sweep worker processes, set once per process by load_shared_trace
+shared_trace = None
+
+
+def sweep_configurations():
+    # Every valid (capacity, block size, associativity) combination
+    return list(product(CacheSimulator.VALID_CAPACITIES, CacheSimulator.VALID_BLOCK_SIZES,
+                        CacheSimulator.VALID_ASSOCIATIVITIES))
+
+
+def load_trace_arrays(trace_file_path, hasher=None):
+    # Parse the trace once into compact operation, address and data arrays
+    operations = bytearray()
+    addresses = array('Q')
+    data = array('Q')
+    for operation, address, value in read_trace(trace_file_path, hasher=hasher):
+        operations.append(operation)
+        addresses.append(address)
+        data.append(value)
+    return operations, addresses, data
+
+
+def load_shared_trace(trace):
+    # Worker initializer: the trace is sent to each worker process once, not once per configuration
+    global shared_trace
+    shared_trace = trace
+
+
+def result_row(config, stats):
+    capacity, block_size, associativity = config
+    total_accesses = stats['data_reads'] + stats['data_writes']
+    row = {'capacity': capacity, 'block_size': block_size, 'associativity': associativity,
+           'num_sets': (capacity * 1024) // (block_size * associativity)}
+    row.update(stats)
+    row['miss_rate'] = stats['cache_misses'] / total_accesses if total_accesses != 0 else 0
+    return row
+
+
+def configuration_result(config):
+    # Run one configuration over the shared trace and return its statistics and cache contents
+    simulator = CacheSimulator(*config)
+    batch.process_trace_arrays(simulator, *shared_trace)
+    return capture_result(simulator)
+
+
+def simulate_configuration(config):
+    # Run one configuration over the shared trace and return its result row
+    return result_row(config, configuration_result(config)['stats'])
+
+
+def map_configurations(function, trace, configs, jobs=None):
+    # Fan the configurations out over a process pool sized to the machine
+    jobs = jobs or os.cpu_count() or 1
+    if jobs == 1:
+        load_shared_trace(trace)
+        return [function(config) for config in configs]
+    with ProcessPoolExecutor(max_workers=jobs, initializer=load_shared_trace, initargs=(trace,)) as pool:
+        return list(pool.map(function, configs))
+
+
+def run_sweep(trace, configs=None, jobs=None):
+    configs = sweep_configurations() if configs is None else configs
+    return map_configurations(simulate_configuration, trace, configs, jobs)
+
+
+def run_cached_sweep(trace_file_path, results_cache, configs=None, jobs=None):
+    # Sweep a trace file, reusing cached results. When every configuration is cached
+    # the trace is not read at all; otherwise it is hashed while it is loaded and only
+    # the missing configurations are simulated.
+    configs = sweep_configurations() if configs is None else configs
+    stat = os.stat(trace_file_path)
+    content_hash = results_cache.known_fingerprint(trace_file_path, stat)
+    results = {}
+    if content_hash is not None:
+        for config in configs:
+            result = results_cache.get(content_hash, config + ('lru', 0))
+            if result is not None:
+                results[config] = result
+    missing = [config for config in configs if config not in results]
+    if missing:
+        hasher = new_hasher()
+        trace = load_trace_arrays(trace_file_path, hasher)
+        content_hash = hasher.hexdigest()
+        results_cache.remember_fingerprint(trace_file_path, stat, content_hash)
+        for config, result in zip(missing, map_configurations(configuration_result, trace, missing, jobs)):
+            results_cache.put(content_hash, config + ('lru', 0), result)
+            results[config] = result
+    return [result_row(config, results[config]['stats']) for config in configs]
+
+
+def write_results(results, output_file_path=None, fields=RESULT_FIELDS):
+    # Write the consolidated table as JSON (.json) or CSV (anything else, default stdout)
+    if output_file_path and output_file_path.endswith('.json'):
+        with open(output_file_path, 'w') as output_file:
+            json.dump(results, output_file, indent=2)
+        return
+    output_file = open(output_file_path, 'w', newline='') if output_file_path else sys.stdout
+    try:
+        writer = csv.DictWriter(output_file, fieldnames=fields)
+        writer.writeheader()
+        writer.writerows(results)
+    finally:
+        if output_file is not sys.stdout:
+            output_file.close()
+
+
+def print_usage():
+    print("Usage: python sweep.py [-j<jobs>] [-o<output_file>] [trace_file]")
+    print("  -j<jobs>: worker processes (default: number of CPUs)")
+    print("  -o<output_file>: .json or .csv results file (default: CSV on stdout)")
+    print("  -d<directory>: results cache (default: ~/.cache/cache-simulator, 'off' to disable)")
+    print("  trace_file: memory trace to sweep (default: memory_trace1.txt)")
+
+
+if __name__ == "__main__":
+    try:
+        options, positional = split_args(sys.argv[1:])
+        params = parse_option_values(options, string_params=('o', 'd'))
+        unknown = set(params) - {'j', 'o', 'd'}
+        if unknown or len(positional) > 1:
+            print_usage()
+            raise ValueError("Invalid arguments")
+        trace_file_path = positional[0] if positional else "memory_trace1.txt"
+
+        results_cache = open_results_cache(params.get('d')) if trace_file_path != '-' else None
+        if results_cache is not None:
+            results = run_cached_sweep(trace_file_path, results_cache, jobs=params.get('j'))
+        else:
+            results = run_sweep(load_trace_arrays(trace_file_path), jobs=params.get('j'))
+        write_results(results, params.get('o'))
+    except FileNotFoundError as e:
+        print(f"Error: The file '{e.filename}' was not found.")
+    except ValueError as e:
+        print(f"Error: {e}")
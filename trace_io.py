@@ -0,0 +1,299 @@
+import gzip
+import io
+import lzma
+import mmap
+import struct
+import sys
+from contextlib import contextmanager
+from itertools import islice
+
+# Operation codes used for parsed trace records
+OP_LOAD = 0
+OP_STORE = 1
+
+# Magic numbers of the compressed trace formats we can read
+GZIP_MAGIC = b'\x1f\x8b'
+XZ_MAGIC = b'\xfd7zXZ\x00'
+
+READ_BUFFER_SIZE = 1024 * 1024
+
+# Binary trace format: an 8-byte magic header followed by fixed-width records of
+# one operation byte, a 64-bit address and a 64-bit data word (little endian)
+BINARY_MAGIC = b'CSTRACE1'
+RECORD = struct.Struct('<BQQ')
+RECORDS_PER_CHUNK = 64 * 1024
+# Addresses and data words are stored as unsigned 64-bit values
+MAX_WORD = (1 << 64) - 1
+
+
+class HashingReader(io.BufferedIOBase):
+    # Byte stream wrapper that feeds every byte read through it into a hashlib object,
+    # so a trace can be fingerprinted in the same pass that simulates it
+    def __init__(self, raw, hasher):
+        self.raw = raw
+        self.hasher = hasher
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        data = self.raw.read(size)
+        self.hasher.update(data)
+        return data
+
+    def read1(self, size=-1):
+        data = self.raw.read1(size)
+        self.hasher.update(data)
+        return data
+
+    def readinto(self, buffer):
+        count = self.raw.readinto(buffer)
+        self.hasher.update(memoryview(buffer)[:count])
+        return count
+
+    def peek(self, size=0):
+        return self.raw.peek(size)
+
+
+class PrefixReader(io.BufferedIOBase):
+    # Byte stream that can look any number of bytes ahead. peek() on a pipe returns at
+    # most one short read, which may be shorter than a magic number, so the bytes are
+    # read here until enough are available and then handed out again before the rest.
+    def __init__(self, raw):
+        self.raw = raw
+        self.prefix = b''
+
+    def readable(self):
+        return True
+
+    def peek(self, size=0):
+        while len(self.prefix) < size:
+            data = self.raw.read1(size - len(self.prefix))
+            if not data:
+                break
+            self.prefix += data
+        return self.prefix
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            data = self.prefix + self.raw.read()
+            self.prefix = b''
+            return data
+        data = self.prefix[:size]
+        self.prefix = self.prefix[size:]
+        if len(data) < size:
+            data += self.raw.read(size - len(data))
+        return data
+
+    def read1(self, size=-1):
+        if not self.prefix:
+            return self.raw.read1(size)
+        if size is None or size < 0:
+            size = len(self.prefix)
+        data = self.prefix[:size]
+        self.prefix = self.prefix[size:]
+        return data
+
+    def readinto(self, buffer):
+        data = self.read(len(buffer))
+        memoryview(buffer)[:len(data)] = data
+        return len(data)
+
+
+# Shared by every reader of stdin, so bytes peeked to detect the format are not lost
+stdin_reader = None
+
+
+def open_stdin():
+    global stdin_reader
+    if stdin_reader is None or stdin_reader.raw is not sys.stdin.buffer:
+        stdin_reader = PrefixReader(sys.stdin.buffer)
+    return stdin_reader
+
+
+@contextmanager
+def open_binary_trace(trace_file_path, hasher=None):
+    # Open a trace as a buffered byte stream; "-" reads from stdin. With a hasher, the
+    # raw bytes of the whole file are hashed as they are read.
+    if trace_file_path == '-':
+        stream = open_stdin()
+        yield stream if hasher is None else HashingReader(stream, hasher)
+        return
+    with open(trace_file_path, 'rb', buffering=READ_BUFFER_SIZE) as trace_file:
+        if hasher is None:
+            yield trace_file
+            return
+        reader = HashingReader(trace_file, hasher)
+        yield reader
+        # Hash anything the consumer left unread so the digest always covers the whole file
+        while reader.read(READ_BUFFER_SIZE):
+            pass
+
+
+@contextmanager
+def open_trace(trace_file_path, hasher=None):
+    # Open a text trace for line-by-line streaming. gzip and xz compressed traces are
+    # detected from their magic number and decompressed on the fly, so neither the
+    # file nor its decompressed contents are ever held in memory as a whole.
+    with open_binary_trace(trace_file_path, hasher) as raw:
+        head = raw.peek(len(XZ_MAGIC))
+        if head.startswith(GZIP_MAGIC):
+            stream = gzip.GzipFile(fileobj=raw, mode='rb')
+        elif head.startswith(XZ_MAGIC):
+            stream = lzma.LZMAFile(raw, mode='rb')
+        else:
+            stream = raw
+        text = io.TextIOWrapper(stream)
+        try:
+            yield text
+        finally:
+            # Detach so that closing the wrapper never closes stdin
+            text.detach()
+
+
+def parse_trace_lines(lines):
+    # Incrementally parse trace lines into (operation, address, data) records
+    for trace in lines:
+        trace = trace.strip()
+        if not trace:
+            continue
+
+        # Expected trace format: "LOAD 0x0001" or "STORE 0x0001 0xAB"
+        parts = trace.split()
+        if len(parts) < 2:
+            print(f"Invalid trace format: {trace}")
+            continue
+
+        operation = parts[0].upper()
+        address = int(parts[1], 16)
+        if not 0 <= address <= MAX_WORD:
+            raise ValueError(f"Address out of range (0 to 2^64-1) in trace line: {trace}")
+
+        if operation == "LOAD":
+            yield OP_LOAD, address, 0
+        elif operation == "STORE":
+            if len(parts) != 3:
+                print(f"Invalid STORE trace format: {trace}")
+                continue
+            value = int(parts[2], 16)
+            if not 0 <= value <= MAX_WORD:
+                raise ValueError(f"Data value out of range (0 to 2^64-1) in trace line: {trace}")
+            yield OP_STORE, address, value
+        else:
+            print(f"Unknown operation type: {operation}")
+
+
+def invalid_binary_operation(chunk):
+    # The first operation byte in a chunk of records that is neither OP_LOAD nor
+    # OP_STORE, or None
+    invalid = bytes(chunk[::RECORD.size]).translate(None, bytes((OP_LOAD, OP_STORE)))
+    return invalid[0] if invalid else None
+
+
+def iter_binary_records(buffer, offset=0, hasher=None):
+    # Decode binary records straight out of a buffer, one chunk of records at a time,
+    # optionally hashing each chunk as it is decoded
+    view = memoryview(buffer)
+    end = offset + (len(view) - offset) // RECORD.size * RECORD.size
+    chunk_size = RECORDS_PER_CHUNK * RECORD.size
+    for chunk_start in range(offset, end, chunk_size):
+        chunk = view[chunk_start:min(chunk_start + chunk_size, end)]
+        operation = invalid_binary_operation(chunk)
+        if operation is not None:
+            # Unknown operations are rejected, as in text traces. Release the views first
+            # so the traceback does not keep a memory-mapped trace from being closed.
+            chunk.release()
+            view.release()
+            raise ValueError(f"Invalid operation {operation} in binary trace record")
+        if hasher is not None:
+            hasher.update(chunk)
+        yield from RECORD.iter_unpack(chunk)
+
+
+def read_binary_trace(trace_file_path, start=0, hasher=None):
+    # Map a binary trace into memory and decode its records without copying the file.
+    # Records are fixed width, so starting at record `start` is a simple offset.
+    if trace_file_path == '-':
+        with open_binary_trace(trace_file_path, hasher) as stream:
+            yield from read_binary_stream(stream, start)
+        return
+    with open(trace_file_path, 'rb') as trace_file:
+        with mmap.mmap(trace_file.fileno(), 0, access=mmap.ACCESS_READ) as mapping:
+            if mapping[:len(BINARY_MAGIC)] != BINARY_MAGIC:
+                raise ValueError(f"Not a binary memory trace: {trace_file_path}")
+            offset = min(len(BINARY_MAGIC) + start * RECORD.size, len(mapping))
+            if hasher is None:
+                yield from iter_binary_records(mapping, offset)
+                return
+            hasher.update(mapping[:offset])
+            yield from iter_binary_records(mapping, offset, hasher)
+            hasher.update(mapping[len(mapping) - (len(mapping) - offset) % RECORD.size:])
+
+
+def read_binary_stream(stream, start=0):
+    # Decode a binary trace from a non-seekable stream such as a pipe
+    if stream.read(len(BINARY_MAGIC)) != BINARY_MAGIC:
+        raise ValueError("Not a binary memory trace")
+    chunk_size = RECORDS_PER_CHUNK * RECORD.size
+    skip = start * RECORD.size
+    while skip > 0:
+        skipped = len(stream.read(min(skip, chunk_size)))
+        if not skipped:
+            return
+        skip -= skipped
+    pending = b''
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        # Pipes may return short reads, so carry any partial record over to the next chunk
+        chunk = pending + chunk
+        whole = len(chunk) // RECORD.size * RECORD.size
+        pending = chunk[whole:]
+        yield from iter_binary_records(chunk[:whole])
+
+
+def is_binary_trace(trace_file_path):
+    # Binary traces are recognised by their magic header rather than by extension
+    with open_binary_trace(trace_file_path) as raw:
+        return raw.peek(len(BINARY_MAGIC))[:len(BINARY_MAGIC)] == BINARY_MAGIC
+
+
+def read_trace(trace_file_path, start=0, hasher=None):
+    # Stream the records of a text or binary trace file one at a time in constant memory,
+    # optionally skipping the first `start` records (as when resuming from a checkpoint).
+    # A hashlib object passed as hasher receives the raw bytes of the file as it is read.
+    if is_binary_trace(trace_file_path):
+        yield from read_binary_trace(trace_file_path, start, hasher)
+        return
+    with open_trace(trace_file_path, hasher) as trace_file:
+        yield from islice(parse_trace_lines(trace_file), start, None)
+
+
+def write_binary_trace(records, binary_file_path):
+    # Write (operation, address, data) records in the binary trace format
+    count = 0
+    pack = RECORD.pack
+    with open(binary_file_path, 'wb', buffering=READ_BUFFER_SIZE) as binary_file:
+        binary_file.write(BINARY_MAGIC)
+        for record in records:
+            binary_file.write(pack(*record))
+            count += 1
+    return count
+
+
+def convert_trace(trace_file_path, binary_file_path):
+    # Convert a text trace (optionally compressed) into the binary trace format
+    return write_binary_trace(read_trace(trace_file_path), binary_file_path)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("Usage: python trace_io.py <text_trace> <binary_trace>")
+        sys.exit(1)
+    try:
+        record_count = convert_trace(sys.argv[1], sys.argv[2])
+        print(f"Converted {record_count} records to {sys.argv[2]}")
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
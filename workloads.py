@@ -0,0 +1,143 @@
+import random
+import sys
+from itertools import accumulate
+
+from memory import WORD_SIZE
+from trace_io import OP_LOAD, OP_STORE, write_binary_trace
+
+# Seeded synthetic memory access patterns. Every generator yields `count`
+# (operation, address, data) records over a footprint of `footprint` bytes, and the
+# same seed always produces the same trace.
+
+DEFAULT_FOOTPRINT = 1024 * 1024
+STORE_FRACTION = 0.3
+# Bytes between consecutive strided accesses and size of one pointer-chase node
+STRIDE = 256
+NODE_SIZE = 64
+ZIPF_EXPONENT = 1.0
+ZIPF_BATCH = 4096
+TILE_SIZE = 16
+
+
+def with_stores(addresses, generator):
+    # Turn an address stream into records where a fixed fraction of accesses are stores
+    rand = generator.random
+    getrandbits = generator.getrandbits
+    for address in addresses:
+        if rand() < STORE_FRACTION:
+            yield OP_STORE, address, getrandbits(32)
+        else:
+            yield OP_LOAD, address, 0
+
+
+def sequential(count, footprint=DEFAULT_FOOTPRINT, seed=1):
+    # Word-by-word sweeps over the footprint
+    words = footprint // WORD_SIZE
+    return with_stores(((position % words) * WORD_SIZE for position in range(count)), random.Random(seed))
+
+
+def strided(count, footprint=DEFAULT_FOOTPRINT, seed=1):
+    # Fixed-stride sweeps, wrapping around to the next word offset after each pass
+    steps = max(footprint // STRIDE, 1)
+    return with_stores((((position % steps) * STRIDE + position // steps * WORD_SIZE) % footprint
+                        for position in range(count)), random.Random(seed))
+
+
+def uniform(count, footprint=DEFAULT_FOOTPRINT, seed=1):
+    # Uniformly random words
+    generator = random.Random(seed)
+    words = footprint // WORD_SIZE
+    randrange = generator.randrange
+    return with_stores((randrange(words) * WORD_SIZE for _ in range(count)), generator)
+
+
+def zipf_addresses(count, footprint, generator):
+    # Blocks drawn with Zipfian popularity; the ranks are shuffled so the hot set is
+    # scattered across the footprint instead of packed at its start
+    blocks = max(footprint // NODE_SIZE, 1)
+    placement = list(range(blocks))
+    generator.shuffle(placement)
+    cumulative = list(accumulate(1.0 / (rank ** ZIPF_EXPONENT) for rank in range(1, blocks + 1)))
+    offsets = NODE_SIZE // WORD_SIZE
+    for start in range(0, count, ZIPF_BATCH):
+        ranks = generator.choices(range(blocks), cum_weights=cumulative, k=min(ZIPF_BATCH, count - start))
+        for rank in ranks:
+            yield placement[rank] * NODE_SIZE + generator.randrange(offsets) * WORD_SIZE
+
+
+def zipf(count, footprint=DEFAULT_FOOTPRINT, seed=1):
+    generator = random.Random(seed)
+    return with_stores(zipf_addresses(count, footprint, generator), generator)
+
+
+def pointer_chase(count, footprint=DEFAULT_FOOTPRINT, seed=1):
+    # Loads following a single random cycle through all nodes (Sattolo's algorithm),
+    # so every access depends on the previous one and there is no spatial locality
+    generator = random.Random(seed)
+    nodes = max(footprint // NODE_SIZE, 2)
+    successor = list(range(nodes))
+    for position in range(nodes - 1, 0, -1):
+        other = generator.randrange(position)
+        successor[position], successor[other] = successor[other], successor[position]
+    node = 0
+    for _ in range(count):
+        yield OP_LOAD, node * NODE_SIZE, 0
+        node = successor[node]
+
+
+def matmul_tiles(count, footprint=DEFAULT_FOOTPRINT, seed=1):
+    # Tiled C += A * B over square matrices of words, sized so that the three matrices
+    # fill the footprint. Each inner step loads A[i][k] and B[k][j] and stores C[i][j];
+    # the multiplication restarts until `count` records were produced.
+    generator = random.Random(seed)
+    order = TILE_SIZE
+    while 3 * (order + TILE_SIZE) ** 2 * WORD_SIZE <= footprint:
+        order += TILE_SIZE
+    matrix_bytes = order * order * WORD_SIZE
+    a_base, b_base, c_base = 0, matrix_bytes, 2 * matrix_bytes
+    getrandbits = generator.getrandbits
+    produced = 0
+    while True:
+        for i0 in range(0, order, TILE_SIZE):
+            for j0 in range(0, order, TILE_SIZE):
+                for k0 in range(0, order, TILE_SIZE):
+                    for i in range(i0, i0 + TILE_SIZE):
+                        for j in range(j0, j0 + TILE_SIZE):
+                            c_address = c_base + (i * order + j) * WORD_SIZE
+                            for k in range(k0, k0 + TILE_SIZE):
+                                for record in ((OP_LOAD, a_base + (i * order + k) * WORD_SIZE, 0),
+                                               (OP_LOAD, b_base + (k * order + j) * WORD_SIZE, 0),
+                                               (OP_STORE, c_address, getrandbits(32))):
+                                    if produced == count:
+                                        return
+                                    yield record
+                                    produced += 1
+
+
+WORKLOADS = {
+    'sequential': sequential,
+    'strided': strided,
+    'uniform': uniform,
+    'zipf': zipf,
+    'pointer_chase': pointer_chase,
+    'matmul_tiles': matmul_tiles,
+}
+
+
+def generate_workload(name, count, footprint=DEFAULT_FOOTPRINT, seed=1):
+    if name not in WORKLOADS:
+        raise ValueError(f"Unknown workload: {name}")
+    return WORKLOADS[name](count, footprint, seed)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) not in (4, 5):
+        print(f"Usage: python workloads.py <{'|'.join(WORKLOADS)}> <accesses> <binary_trace> [seed]")
+        sys.exit(1)
+    try:
+        seed = int(sys.argv[4]) if len(sys.argv) == 5 else 1
+        record_count = write_binary_trace(generate_workload(sys.argv[1], int(sys.argv[2]), seed=seed), sys.argv[3])
+        print(f"Wrote {record_count} records to {sys.argv[3]}")
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)